@@ -1,28 +1,40 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Make the shared utils folder importable
 import tiktok_api as api
 import asyncio
 import pandas as pd
 import json
-import os
+from utils.video_cache import VideoCache
+from utils.hashtag_registry import register_hashtags
+from utils.pipeline import IncrementalCsvWriter, run_pipeline
+from utils.dataset_store import DatasetStore
+from utils.url_registry import UrlRegistry, new_run_id
+from utils.checkpoint import UrlCheckpoint
+from utils.metrics import metrics
 
 PLATFORM = 'tiktok' # Change to the target platform
 COUNTRY = "NL" # Change to the target country
 SEARCH_HASHTAG = "#ai"  # Change to the target hashtag
 TOTAL_VIDEOS_NEEDED = 250  # Number of videos to scrape
+NUM_SESSIONS = 1  # Number of TikTokApi sessions used to fetch the video details
+CALLS_PER_SESSION = 2  # Number of video info calls in flight per session
+HTTP_CONCURRENCY = 16  # Number of video pages fetched at the same time, also the size of a streaming batch
+STREAMING = True  # Fetch the video details while scrolling instead of after scrolling
+RESUME = True  # Continue from the URLs of an interrupted run, False starts the scrape from zero
 
 TARGET_CSV = f'data/{PLATFORM}/{SEARCH_HASHTAG}/{SEARCH_HASHTAG}_{COUNTRY}.csv'
 TARGET_JSON = f'data/{PLATFORM}/{SEARCH_HASHTAG}/{SEARCH_HASHTAG}_{COUNTRY}.json'
 HASHTAG_JSON = f'data/hashtag_set.json'
+CACHE_PATH = 'data/video_cache.sqlite'
+REGISTRY_PATH = 'data/url_registry.sqlite'
+STORE_PATH = 'data/store'  # Typed Parquet copy of all runs, partitioned by platform/hashtag/country
+STATE_PATH = f'data/session_state/{PLATFORM}_{COUNTRY}.json'  # Saved consent/captcha state, reused by the next run
+CHECKPOINT_PATH = f'data/checkpoints/{PLATFORM}/{SEARCH_HASHTAG}_{COUNTRY}.txt'  # Harvested URLs, removed when the run finished
 TARGET_FOLDER = f'data/{PLATFORM}/{SEARCH_HASHTAG}'
 
-with open(HASHTAG_JSON, 'r') as f:
-    hashtag_set = json.load(f)
-
-if SEARCH_HASHTAG not in hashtag_set:
-    hashtag_set.append(SEARCH_HASHTAG)
-
-# save new json with new hashtag
-with open(HASHTAG_JSON, 'w') as f:
-    json.dump(hashtag_set, f, indent=4)  
+# add the new hashtag to the json, the lock makes this safe when several runs start at once
+hashtag_set = register_hashtags([SEARCH_HASHTAG], path=HASHTAG_JSON)
 
 async def main():
     """Main function that searches for TikTok videos and fetches details."""
@@ -30,7 +42,47 @@ async def main():
     os.makedirs(TARGET_FOLDER, exist_ok=True)
 
     # Create an instance of the TikTokScraper class
-    scraper = api.TikTokScraper(target_urls=TOTAL_VIDEOS_NEEDED, search_query=SEARCH_HASHTAG, headless=False)
+    scraper = api.TikTokScraper(target_urls=TOTAL_VIDEOS_NEEDED, search_query=SEARCH_HASHTAG, headless=False,
+                                state_path=STATE_PATH, checkpoint=UrlCheckpoint(CHECKPOINT_PATH, resume=RESUME))
+
+    tiktok_api = api.TikTokAPI(cache=VideoCache(CACHE_PATH), num_sessions=NUM_SESSIONS, calls_per_session=CALLS_PER_SESSION,
+                               http_concurrency=HTTP_CONCURRENCY)
+
+    # Keeps track of all scraped urls over all runs
+    registry = UrlRegistry(REGISTRY_PATH)
+    run_id = new_run_id()
+
+    if STREAMING:
+        # Fetch the details of the new URLs while the scraper is still scrolling, on sessions that stay open
+        writer = IncrementalCsvWriter(TARGET_CSV)
+        frames = []
+
+        async def enrich(batch):
+            registry.register(batch, SEARCH_HASHTAG, COUNTRY, run_id)
+            df = await tiktok_api.fetch_video_details(batch, search_hashtag_set=hashtag_set)
+            registry.mark_enriched(df.get('url', []))
+            df['country'] = COUNTRY
+            df['platform'] = PLATFORM
+            frames.append(df)
+            return df
+
+        await tiktok_api.start_sessions(lazy=True)  # Only started when a video page could not be read
+        try:
+            # A batch fills every HTTP connection, the few pages that fail go to the sessions
+            await run_pipeline(scraper.stream_urls(), enrich, writer.write, batch_size=HTTP_CONCURRENCY, max_wait=2.0)
+        finally:
+            await tiktok_api.close_sessions()
+        writer.close()
+
+        # export the urls as json
+        with open(TARGET_JSON, 'w') as f:
+            json.dump(list(scraper.processed_urls), f)
+        scraper.checkpoint.complete()
+        if frames:
+            DatasetStore(STORE_PATH).write(pd.concat(frames, ignore_index=True), PLATFORM, SEARCH_HASHTAG, COUNTRY)
+
+        print("Video data saved successfully! in", TARGET_CSV)
+        return
 
     # Run the scrape function and retrieve the URLs
     urls = await scraper.scrape_urls()
@@ -38,11 +90,13 @@ async def main():
     # export the urls as json
     with open(TARGET_JSON, 'w') as f:
         json.dump(urls, f)
+    scraper.checkpoint.complete()
 
-    tiktok_api = api.TikTokAPI()
+    registry.register(urls, SEARCH_HASHTAG, COUNTRY, run_id)
 
     # Gather information about the urls
     df = await tiktok_api.fetch_video_details(urls, search_hashtag_set=hashtag_set)
+    registry.mark_enriched(df.get('url', []))
 
     # add a column country with the value of COUNTRY
     df['country'] = COUNTRY
@@ -52,9 +106,13 @@ async def main():
 
     # Save to CSV
     df.to_csv(TARGET_CSV, index=False)
+    DatasetStore(STORE_PATH).write(df, PLATFORM, SEARCH_HASHTAG, COUNTRY)
 
     print("Video data saved successfully! in", TARGET_CSV)
 
 # Run everything inside an async event loop
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    finally:
+        metrics.export(script='hashtag_search', platform=PLATFORM, hashtag=SEARCH_HASHTAG, country=COUNTRY)
@@ -1,16 +1,40 @@
 import asyncio
-import random
-from playwright.async_api import async_playwright
+from utils.network import ResourceBlocker
+from utils.scroll import scroll_feed, smooth_scroll_up
+from utils.harvester import LinkHarvester
+from utils.browser_pool import BrowserPool
+from utils.hashtags import extract_hashtags, compile_hashtags
+from utils.metrics import metrics, COUNT_BUCKETS
+from utils.pacing import PacingController, YieldModel
+from utils.session_state import load_state, save_state, race_selectors
 import urllib.parse  # Import this to encode URLs
 from TikTokApi import TikTokApi
+from TikTokApi.exceptions import CaptchaException, EmptyResponseException, NotFoundException
+from playwright.async_api import Error as PlaywrightError
 import datetime
 import asyncio
-import re
 import pandas as pd
 import os
+import re
+import json
+import httpx
+
+CAPTCHA_SELECTOR = "#captcha-verify-container-main-page, .captcha-verify-container, #tiktok-verify-ele"
+FEED_SELECTOR = "a[href*='/video/']"
+
+# Errors of a session that timed out, crashed or is detected as a bot, these count towards rotating the session out
+SESSION_ERRORS = (TimeoutError, PlaywrightError, CaptchaException, EmptyResponseException)
+
+
+class VideoUnavailable(Exception):
+    """The video page has a non-zero statusCode, e.g. a removed or private video."""
+
+
+# Errors of a removed or private video, another session or attempt gives the same answer
+VIDEO_MISSING_ERRORS = (NotFoundException, VideoUnavailable)
 
 class TikTokScraper:
-    def __init__(self, target_urls=50, max_scrolls=2, max_scroll_attempts=100, search_query=None, headless = False):
+    def __init__(self, target_urls=50, max_scrolls=2, max_scroll_attempts=100, search_query=None, headless = False, block_profile="feed", proxy=None, pacing=None, site_url="https://www.tiktok.com", state_path=None, challenge_timeout=15, captcha_timeout=120, checkpoint=None):
         self.target_urls = target_urls
         self.max_scrolls = max_scrolls
         self.max_scroll_attempts = max_scroll_attempts
@@ -18,221 +42,532 @@ class TikTokScraper:
         self.search_query = search_query
         self.headless = headless
         self.scroll_attempts = 0
+        self.blocker = ResourceBlocker(block_profile)  # Blocks media, images, fonts and trackers
+        self.proxy = proxy  # Optional Playwright proxy settings, e.g. to scrape a country from a shared browser
+        self.pacing = pacing or {}  # Optional PacingController settings, e.g. {"max_wait": 6} for slow networks
+        self.pacer = None
+        self.site_url = site_url  # Site the hashtag page is opened on, a local stand-in for the benchmarks
+        self.state_path = state_path  # Saved session of a solved captcha, so a warm run skips the captcha
+        self.challenge_timeout = challenge_timeout  # Seconds to wait for a captcha or the first videos
+        self.captcha_timeout = captcha_timeout  # Seconds to solve a captcha by hand
+        self.checkpoint = checkpoint  # Optional UrlCheckpoint, every harvested URL is flushed to it right away
+        self.resumed_urls = list(checkpoint.urls) if checkpoint else []  # URLs of an interrupted earlier run
 
     def encode_search_query(self, search_query):
         """Deletes the # for TikTok and make it lower case for the consistency."""
         search_query = search_query.lower()
         return urllib.parse.quote(search_query[1:])
 
-    async def scrape_urls(self):
-        """Scrapes TikTok URLs using proper scrolling."""
-        async with async_playwright() as p:
-            encoded_search_query = self.encode_search_query(self.search_query)
-            browser = await p.firefox.launch(headless=self.headless)  # Use Chromium if needed
-            context = await browser.new_context(storage_state=None) # Incognito mode
-            page = await context.new_page()
-
-            search_url = f"https://www.tiktok.com/tag/{encoded_search_query}"
-
-            print(f"Opening: {search_url}")
+    def format_url(self, href):
+        """Makes a https://www.tiktok.com/{username}/video/{id} URL of an anchor href, returns None for other links."""
+        if not href or "/video/" not in href:
+            metrics.inc("invalid_hrefs_total", platform="tiktok")
+            return None
+        # Extract the username and video ID from the URL
+        parts = href.split("/")
+        if len(parts) < 4:
+            metrics.inc("invalid_hrefs_total", platform="tiktok")
+            return None
+        username = parts[3]  # Username is the second element
+        video_id = parts[-1]  # Video ID is always the last element
+
+        # Construct the full TikTok video URL
+        return f"https://www.tiktok.com/{username}/video/{video_id}"
+
+    async def scrape_urls(self, pool=None):
+        """Scrapes TikTok URLs using proper scrolling, in a shared BrowserPool if one is given."""
+        return [url async for url in self.stream_urls(pool)]
+
+    async def stream_urls(self, pool=None):
+        """
+        Yields every newly found TikTok URL while scrolling, so it can be enriched right away.
+        The URLs of a resumed checkpoint are yielded first, the scraping continues until the target is reached.
+        """
+        for url in self.resumed_urls:
+            yield url
+        if len(self.resumed_urls) >= self.target_urls:
+            self.processed_urls = set(self.resumed_urls)
+            return
+
+        own_pool = pool is None
+        if own_pool:
+            pool = await BrowserPool(headless=self.headless, warm_contexts=0).start()  # Use firefox 
+        try:
+            # Incognito mode on the first run, later runs start from the saved session
+            async with pool.context(storage_state=load_state(self.state_path), proxy=self.proxy, reuse=False) as context:
+                async for url in self.stream_with_context(context):
+                    yield url
+        finally:
+            if own_pool:
+                await pool.close()
+
+    async def stream_with_context(self, context):
+        """Scrolls the hashtag page in the context and yields the new URLs."""
+        encoded_search_query = self.encode_search_query(self.search_query)
+        page = await context.new_page()
+        await self.blocker.attach(page)
+
+        search_url = f"{self.site_url}/tag/{encoded_search_query}"
+
+        print(f"Opening: {search_url}")
+        with metrics.timer("page_load_seconds", platform="tiktok", page="feed"):
             await page.goto(search_url)
 
-            # Waiting 30 seconds to solve the captcha
-            print("Waiting 30 seconds to solve the captcha")
-            await asyncio.sleep(30)
-
-            # Wait until the page is loaded and tiktok videos appear
+        # Only wait for a captcha solve when a captcha is actually shown
+        with metrics.timer("selector_wait_seconds", platform="tiktok", selector="captcha"):
+            shown = await race_selectors(page, {"captcha": CAPTCHA_SELECTOR, "feed": FEED_SELECTOR},
+                                         timeout=self.challenge_timeout)
+        if shown == "captcha":
+            metrics.inc("captchas_total", platform="tiktok")
+            if self.headless:
+                print("Captcha shown in a headless browser, run once with headless=False to solve it and save the session")
+            print(f"Waiting up to {self.captcha_timeout} seconds to solve the captcha")
+            with metrics.timer("selector_wait_seconds", platform="tiktok", selector="captcha_solve"):
+                shown = await race_selectors(page, {"feed": FEED_SELECTOR}, timeout=self.captcha_timeout)
+        if shown == "feed":
+            if self.state_path:
+                # The captcha clearance is spread over several cookies and the local storage, so the full state is kept
+                await save_state(context, self.state_path)
+        else:
+            print("No videos appeared, the captcha may not be solved.")
+
+        # Wait until the page is loaded and tiktok videos appear
+        with metrics.timer("page_load_seconds", platform="tiktok", page="feed_networkidle"):
             await page.wait_for_load_state("networkidle")  # Wait for network to be idle
-            await page.evaluate("document.body.style.zoom='50%'")  # Zoom out to 50%
-            print("Page loaded, starting scrolling...")
-
-            # Scroll Until Enough Videos Are Loaded
-            unique_results = set()
-            self.scroll_attempts = 0
-            no_new_shorts_count = 0  # Tracks how many times no new videos are found
-
-            while len(unique_results) < self.target_urls and self.scroll_attempts < self.max_scroll_attempts:
-                self.scroll_attempts += 1
-                previous_video_count = len(unique_results)
-
-                print(f"Scrolling... (Collected: {len(unique_results)}/{self.target_urls})")
-                await self.scroll_page(page)  # Use optimized scrolling
-
-                # Extract Shorts URLs
-                videos = await page.locator("a[href*='/video/']").all()
-                for video in videos:
-                    try:
-                        video_url = await video.get_attribute("href")
-                        if video_url and "/video/" in video_url:
-
-                            # Extract the username and video ID from the URL
-                            parts = video_url.split("/")
-                            username = parts[3]  # Username is the second element
-                            video_id = parts[-1]  # Video ID is always the last element
-
-                            # Construct the full TikTok video URL
-                            formatted_url = f"https://www.tiktok.com/{username}/video/{video_id}"
-                            
-                            # Add the properly formatted URL to the set
-                            unique_results.add(formatted_url)
-                    except Exception as e:
-                        print(f"Error processing video: {e}")
-                        continue  
-
-                # Check if new TikToks were added
-                if len(unique_results) == previous_video_count:
-                    no_new_shorts_count += 1
-                    print(f"No new TikToks found ({no_new_shorts_count}/{self.max_scrolls}).")
-                else:
-                    no_new_shorts_count = 0  
-        
-                if no_new_shorts_count >= self.max_scrolls:
-                    print("No new TikToks found after multiple scrolls. Stopping scrolling.")
-                    break  
-            
-            # FINAL CHECK: Process last batch of TikToks after scrolling stops
-            print("Performing final extraction of TikToks before exiting...")
-            final_videos = await page.locator("a[href*='/video/']").all()
-
-            for video in final_videos:
-                try:
-                    video_url = await video.get_attribute("href")
-
-                    # Ensure the URL is not None and contains "/video/"
-                    if video_url and "/video/" in video_url:
-                        # Extract the username and video ID from the URL
-                        parts = video_url.split("/")
-                        username = parts[3]  # Username is the second element
-                        video_id = parts[-1]  # Video ID is always the last element
-
-                        # Construct the full TikTok video URL
-                        formatted_url = f"https://www.tiktok.com/{username}/video/{video_id}"
-
-                        # Add the properly formatted URL to the set
-                        unique_results.add(formatted_url)
-
-                except Exception as e:
-                    print(f"Error processing video: {e}")
-                    continue
-
-            print("Finished scrolling. Extracting TikTok links...")
-            print(f"Total unique TikTok URLs found: {len(unique_results)}")
-
-            # Save Unique Shorts URLs
-            results_list = list(unique_results)
+        await page.evaluate("document.body.style.zoom='50%'")  # Zoom out to 50%
+        print("Page loaded, starting scrolling...")
+
+        # Collect the video links inside the page, only new links are handed over after each scroll
+        harvester = LinkHarvester(page, FEED_SELECTOR)
+        await harvester.install()
+        self.pacer = PacingController(page, **self.pacing).attach()
+        yield_model = YieldModel(max_zero_streak=self.max_scrolls)
+
+        # Scroll Until Enough Videos Are Loaded
+        self.processed_urls = set(self.resumed_urls)
+        unique_results = self.processed_urls
+        self.scroll_attempts = 0
 
-            await browser.close()
+        while len(unique_results) < self.target_urls and self.scroll_attempts < self.max_scroll_attempts:
+            self.scroll_attempts += 1
+            previous_video_count = len(unique_results)
+
+            print(f"Scrolling... (Collected: {len(unique_results)}/{self.target_urls})")
+            with metrics.timer("scroll_seconds", platform="tiktok"):
+                settled = await self.scroll_page(page)  # Waits until the feed delivered the new content
+
+            # Extract TikTok URLs
+            hrefs, new_urls = await harvester.collect(self.format_url, unique_results, self.checkpoint)
+            for formatted_url in new_urls:
+                yield formatted_url
+
+            # Number of new TikToks this scroll brought in
+            new_tiktoks = len(unique_results) - previous_video_count
+            metrics.observe("scroll_yield_urls", new_tiktoks, buckets=COUNT_BUCKETS, platform="tiktok")
+            metrics.inc("urls_scraped_total", new_tiktoks, platform="tiktok")
+
+            # Stop when the yield curve shows that the feed is exhausted
+            # After a resume the feed starts at the top again, links of the earlier run still show progress
+            yield_model.update(len(hrefs) if self.resumed_urls else new_tiktoks, settled)
+            if new_tiktoks == 0:
+                print(f"No new TikToks found ({yield_model.summary()}).")
+            if yield_model.should_stop():
+                print("No new TikToks found after multiple scrolls. Stopping scrolling.")
+                break
+        
+        # FINAL CHECK: Process last batch of TikToks after scrolling stops
+        print("Performing final extraction of TikToks before exiting...")
+        _, new_urls = await harvester.collect(self.format_url, unique_results, self.checkpoint)
+        for formatted_url in new_urls:
+            yield formatted_url
 
-            return results_list
+        print("Finished scrolling. Extracting TikTok links...")
+        print(f"Total unique TikTok URLs found: {len(unique_results)}")
+        print(self.blocker.summary())
 
     async def scroll_page(self, page, speed=10):
-        """Smoothly scrolls down the page with a variable speed."""
-        current_scroll_position = await page.evaluate(
-            "() => document.documentElement.scrollTop || document.body.scrollTop;")
-        total_height = await page.evaluate(
-            "() => document.documentElement.scrollHeight || document.body.scrollHeight;")
-
-        # Scroll between 30-50% of the total page height
-        scroll_distance = random.randint(int(total_height * 0.2), int(total_height * 0.8))
-        target_position = current_scroll_position + scroll_distance
-
-        print(f"Scrolling from {current_scroll_position} to {target_position} / {total_height}")
-
-        while current_scroll_position < target_position:
-            step = speed + random.randint(-speed, speed)  # Randomized scroll speed
-            current_scroll_position += step
-            await page.evaluate(f"() => window.scrollTo(0, {current_scroll_position});")
-            await asyncio.sleep(random.uniform(0.02, 0.1))  # Short pauses for smooth effect
-
-        # Extra delay to allow TikTok to load new content
-        await asyncio.sleep(random.uniform(2, 4))  
-
-        # Pause briefly every 5 scrolls to make it not too agressive
-        if self.scroll_attempts % 5 == 0:
-            print("Pausing briefly to make it not too agressive...")
-            await asyncio.sleep(random.uniform(5, 8))
+        """Smoothly scrolls down 20-80% of the page height with a variable speed and waits for the new content."""
+        return await scroll_feed(page, self.pacer, self.scroll_attempts, 0.2, 0.8, speed)
 
     async def slight_scroll_up(self, page, speed=10):
         """Smoothly scrolls up slightly to refresh content."""
-        desired_scroll = -300  # Amount to scroll up
-        current_scroll = 0
-
-        print(f"Smooth scrolling up by {desired_scroll} pixels")
+        await smooth_scroll_up(page, 300, speed)
+
+# The video page embeds the same video info that TikTokApi returns, as rehydration JSON
+REHYDRATION_PATTERN = re.compile(
+    r'<script[^>]*id="__UNIVERSAL_DATA_FOR_REHYDRATION__"[^>]*>(.*?)</script>', re.DOTALL)
+PAGE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:128.0) Gecko/20100101 Firefox/128.0",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+def extract_item_struct(html):
+    """
+    Returns the video info (itemStruct) in the rehydration JSON of a TikTok video page, None when it is missing.
+    Raises VideoUnavailable when the page says the video is removed or private.
+    """
+    match = REHYDRATION_PATTERN.search(html)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(1))
+    except ValueError:
+        return None
+    detail = data.get("__DEFAULT_SCOPE__", {}).get("webapp.video-detail", {})
+    if detail.get("statusCode", 0) != 0:
+        raise VideoUnavailable(f"statusCode {detail['statusCode']}")
+    item = detail.get("itemInfo", {}).get("itemStruct")
+    return item if isinstance(item, dict) and item.get("id") else None
 
-        while current_scroll > desired_scroll:
-            step = speed + random.randint(-speed, speed)  # Randomized speed for a natural effect
-            current_scroll -= step
-            await page.evaluate(f"() => window.scrollBy(0, {-step});")
-            await asyncio.sleep(random.uniform(0.02, 0.1))  # Short pauses for smooth effect
 
 class TikTokAPI: 
-    def __init__(self):
+    def __init__(self, cache=None, ms_tokens=None, num_sessions=1, calls_per_session=1, max_retries=3,
+                 max_session_failures=5, max_session_restarts=2, headless=False, extraction="http",
+                 http_concurrency=16, site_url="https://www.tiktok.com"):
         self.ms_token = os.environ.get("ms_token", None)  # Set your own ms_token
-        
-    async def fetch_video_details(self, urls, search_hashtag_set):
-        """Fetches details for each TikTok video and returns a DataFrame."""
-
-        search_hashtags_lower = [] 
-
-        for search_hashtag in search_hashtag_set:
-            # Convert the search term to lowercase for case-insensitive matching
-            search_hashtags_lower.append(search_hashtag.lower())
-
-        async with TikTokApi() as api:
-            data_list = []
-            info_gathered = 0
-            
-            await api.create_sessions(
-                ms_tokens=[self.ms_token], num_sessions=1, sleep_after=3, 
-                browser=os.getenv("TIKTOK_BROWSER", "chromium"), headless=False
-            )
+        if ms_tokens is None and os.environ.get("ms_tokens"):
+            ms_tokens = os.environ["ms_tokens"].split(",")  # Pool mode: several comma separated ms_tokens
+        self.ms_tokens = ms_tokens or [self.ms_token]
+        self.cache = cache  # optional VideoCache, only cache misses are fetched from TikTok
+        self.num_sessions = num_sessions
+        self.calls_per_session = calls_per_session  # Number of video.info() calls in flight per session
+        self.max_retries = max_retries  # Attempts per URL before it is given up
+        self.max_session_failures = max_session_failures  # Consecutive failures before a session is rotated out
+        self.max_session_restarts = max_session_restarts  # Fresh sessions started per call once all were rotated out
+        self.headless = headless
+        # "http" reads the video info from the video page HTML and only uses the sessions for the URLs that failed,
+        # "sessions" fetches every URL with the TikTokApi sessions
+        self.extraction = extraction
+        self.http_concurrency = http_concurrency  # Number of video pages fetched at the same time
+        self.http_client = None  # Pooled client of the video pages, kept open between start_sessions and close_sessions
+        self.site_url = site_url  # Site the video pages are fetched from, a local stand-in for the benchmarks
+        self.api = None
+        self.lazy_sessions = False  # Start the sessions on first use and keep them open until close_sessions
+        self.session_lock = asyncio.Lock()
+        self.healthy_sessions = set()
+        self.session_failures = {}
+        self.unavailable_ids = set()  # Video IDs of removed or private videos
+
+    def extract_video_id(self, url):
+        """Extracts the video ID from a TikTok video URL."""
+        return url.rstrip("/").split("/")[-1]
+
+    def stats_record(self, video_info):
+        """Returns the engagement counters (statsV2) of the video info."""
+        stats = video_info.get('statsV2', {})
+        return {
+            "views": stats.get("playCount", 0),
+            "likes": stats.get("diggCount", 0),
+            "comments": stats.get("commentCount", 0),
+            "shares": stats.get("shareCount", 0),
+        }
+
+    def video_record(self, url, video_info):
+        """Turns the video info of the TikTok API into a record."""
+        # Extract additional video details
+        contents = video_info.get('contents', '')  # Video content description
+        create_time = video_info.get('createTime', 'unknown')  # Get video creation time
+
+        return {
+            "url": url, # Keep the original URL
+            "ai_label": video_info.get('aigcLabelType', 0),  # AI-generated content label
+            **self.stats_record(video_info),  # Engagement counters
+            "hashtags": extract_hashtags(str(contents)) if contents else [],  # Extract hashtags
+            "publishedAt" : datetime.datetime.fromtimestamp(int(create_time)).strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    def select_matching(self, urls, records, search_hashtag_set):
+        """Returns the records (in the order of urls) that contain one of the search hashtags."""
+        # Case-insensitive matcher of the search hashtags
+        matcher = compile_hashtags(search_hashtag_set)
+
+        data_list = []
+        seen_urls = set()
+        for url in urls:
+            record = records.get(self.extract_video_id(url))
+            if record is None:
+                continue
+            # Filter: Only include if the search term is present
+            if matcher.matches(record["hashtags"]):
+                if record["url"] not in seen_urls:  # Check whether the URL is already in the list
+                    seen_urls.add(record["url"])
+                    data_list.append(record)
+        return data_list
+
+    async def start_sessions(self, lazy=False):
+        """
+        Starts the TikTokApi browser sessions, they stay open until close_sessions is called.
+        With lazy=True they are only started once a video needs them, e.g. when its page could not be read.
+        The pooled HTTP client of the video pages is opened right away.
+        """
+        if self.extraction == "http" and self.http_client is None:
+            self.http_client = self.open_http_client()
+        if lazy:
+            self.lazy_sessions = True
+            return
+        self.api = TikTokApi()
+        await self.api.create_sessions(
+            ms_tokens=self.ms_tokens, num_sessions=self.num_sessions, sleep_after=3, 
+            browser=os.getenv("TIKTOK_BROWSER", "chromium"), headless=self.headless
+        )
+        self.healthy_sessions = set(range(len(self.api.sessions)))
+        self.session_failures = {session_index: 0 for session_index in self.healthy_sessions}
+        print(f"Started {len(self.healthy_sessions)} TikTok sessions.")
+
+    async def stop_api(self):
+        if self.api is not None:
+            await self.api.close_sessions()
+            await self.api.stop_playwright()
+            self.api = None
+
+    async def close_sessions(self):
+        """Closes the TikTokApi browser sessions."""
+        self.lazy_sessions = False
+        await self.stop_api()
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+
+    async def restart_sessions(self):
+        """Replaces the sessions when all of them were rotated out, a no-op when another call already did."""
+        async with self.session_lock:
+            if self.api is not None and self.healthy_sessions:
+                return
+            if self.api is not None:
+                print("All TikTok sessions were rotated out, starting new sessions.")
+                metrics.inc("session_restarts_total", api="tiktok")
+            await self.stop_api()
+            await self.start_sessions()
+
+    def mark_session_failed(self, session_index):
+        """Counts a failed call and rotates the session out after too many failures in a row."""
+        self.session_failures[session_index] += 1
+        if self.session_failures[session_index] >= self.max_session_failures and session_index in self.healthy_sessions:
+            self.healthy_sessions.discard(session_index)
+            metrics.inc("sessions_rotated_total", api="tiktok")
+            metrics.set("healthy_sessions", len(self.healthy_sessions), api="tiktok")
+            print(f"Session {session_index} failed {self.session_failures[session_index]} times in a row, "
+                  f"rotating it out ({len(self.healthy_sessions)} sessions left).")
+
+    async def session_worker(self, session_index, queue, fetched_records):
+        """Takes URLs from the queue and fetches them on one session until the session is rotated out."""
+        while session_index in self.healthy_sessions:
+            url, attempts, failed_sessions, deferrals = await queue.get()
+            metrics.set("queue_depth", queue.qsize(), queue="tiktok_sessions")
+            try:
+                if session_index not in self.healthy_sessions:
+                    # The session died while waiting, hand the URL to another session
+                    queue.put_nowait((url, attempts, failed_sessions, deferrals))
+                    break
+
+                # Leave the URL for a healthy session that has not failed on it yet, but only a few times:
+                # workers that wait in step can keep taking each other's URLs, then this session tries it again
+                if session_index in failed_sessions and self.healthy_sessions - failed_sessions \
+                        and deferrals < len(self.healthy_sessions) * self.calls_per_session:
+                    queue.put_nowait((url, attempts, failed_sessions, deferrals + 1))
+                    await asyncio.sleep(0.1)
+                    continue
 
-            for url in urls:
                 try:
-                    video = api.video(url=url)
-                    video_info = await video.info()  # Fetch video details
-                    info_gathered += 1
-                    
-                    # Extract author and stats data
-                    stats = video_info.get('statsV2', {})
-
-                    tiktok_link = url # Keep the original URL	
-                    
-                    # Extract additional video details
-                    ai_label = video_info.get('aigcLabelType', 0)  # AI-generated content label
-                    contents = video_info.get('contents', '')  # Video content description
-                    hashtags = re.findall(r"#\w+", str(contents)) if contents else []  # Extract hashtags
-                    create_time = video_info.get('createTime', 'unknown')  # Get video creation time
-                    
-                    # Extract engagement metrics
-                    likes = stats.get("diggCount", 0)
-                    comments = stats.get("commentCount", 0)
-                    shares = stats.get("shareCount", 0)
-                    views = stats.get("playCount", 0)
-                    
-                    hashtags_lower = [tag.lower() for tag in hashtags]  # Convert all hashtags to lowercase
-
-                    # Filter: Only include if the search term is present
-                    if any(search_hashtag in hashtags_lower for search_hashtag in search_hashtags_lower):
-                        if tiktok_link not in {entry["url"] for entry in data_list}:  # Check whether the URL is already in the list
-                            # Append extracted data to the list
-                            data_list.append({
-                                "url": tiktok_link,
-                                "ai_label": ai_label,
-                                "views": views,
-                                "likes": likes,
-                                "comments": comments,
-                                "shares": shares,
-                                "hashtags": hashtags,
-                                "publishedAt" : datetime.datetime.fromtimestamp(int(create_time)).strftime('%Y-%m-%d %H:%M:%S')
-                            })
-
-                    if info_gathered % 25 == 0:
-                        print(f"Processed {info_gathered} videos...")
+                    video = self.api.video(url=url)
+                    with metrics.timer("api_request_seconds", api="tiktok"):
+                        video_info = await video.info(session_index=session_index)  # Fetch video details
+                    metrics.inc("api_requests_total", api="tiktok", status="ok")
+                except VIDEO_MISSING_ERRORS:
+                    metrics.inc("api_requests_total", api="tiktok", status="unavailable")
+                    self.unavailable_ids.add(self.extract_video_id(url))
+                    continue
+                except Exception as e:
+                    metrics.inc("api_requests_total", api="tiktok", status="error")
+                    metrics.inc("api_errors_total", api="tiktok", reason=type(e).__name__)
+                    if isinstance(e, SESSION_ERRORS):
+                        self.mark_session_failed(session_index)
+                        failed_sessions = failed_sessions | {session_index}
+                    if attempts + 1 < self.max_retries:
+                        metrics.inc("api_retries_total", api="tiktok")
+                        queue.put_nowait((url, attempts + 1, failed_sessions, 0))
+                    else:
+                        print(f"Error fetching video info for {url}: {e}")
+                    continue
 
+                self.session_failures[session_index] = 0
+                try:
+                    fetched_records[self.extract_video_id(url)] = self.video_record(url, video_info)
                 except Exception as e:
                     print(f"Error fetching video info for {url}: {e}")
+                    continue
 
-            print(f"Total videos processed: {len(data_list)}")
+                if len(fetched_records) % 25 == 0:
+                    print(f"Processed {len(fetched_records)} videos...")
+            finally:
+                queue.task_done()
+
+    async def fetch_with_sessions(self, urls):
+        """Fetches the video info of the URLs with all healthy sessions, returns a dict video_id -> record."""
+        fetched_records = {}
+        queue = asyncio.Queue()
+        for url in urls:
+            queue.put_nowait((url, 0, frozenset(), 0))
+
+        restarts = 0
+        while True:
+            workers = [
+                asyncio.create_task(self.session_worker(session_index, queue, fetched_records))
+                for session_index in sorted(self.healthy_sessions)
+                for _ in range(self.calls_per_session)
+            ]
+            queue_done = asyncio.create_task(queue.join())
+            workers_done = asyncio.gather(*workers)
+
+            # Stops when every URL is handled, or when all sessions have been rotated out
+            await asyncio.wait([queue_done, workers_done], return_when=asyncio.FIRST_COMPLETED)
+            all_handled = queue_done.done()
+            queue_done.cancel()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(queue_done, workers_done, return_exceptions=True)
+            if all_handled:
+                break
+            if restarts >= self.max_session_restarts:
+                print(f"All TikTok sessions failed, {queue.qsize()} videos were not fetched.")
+                break
+
+            # The left URLs go to new sessions, these have the indices of the sessions that failed on them
+            restarts += 1
+            await self.restart_sessions()
+            left = [queue.get_nowait() for _ in range(queue.qsize())]
+            queue = asyncio.Queue()
+            for url, attempts, _, _ in left:
+                queue.put_nowait((url, attempts, frozenset(), 0))
+        return fetched_records
+
+    def page_url(self, url):
+        """The URL of the video page on site_url."""
+        return self.site_url + urllib.parse.urlparse(url).path
+
+    async def fetch_page_info(self, client, url):
+        """Fetches the video page without a browser and returns its video info, None when it has none."""
+        response = await client.get(self.page_url(url))
+        if response.status_code != 200:
+            return None
+        return extract_item_struct(response.text)
+
+    def open_http_client(self):
+        cookies = {"msToken": self.ms_token} if self.ms_token else None
+        limits = httpx.Limits(max_connections=self.http_concurrency, max_keepalive_connections=self.http_concurrency)
+        return httpx.AsyncClient(headers=PAGE_HEADERS, cookies=cookies, limits=limits, follow_redirects=True, timeout=30)
+
+    async def fetch_with_http(self, urls):
+        """
+        Fetches the video info of the URLs from the video pages with the pooled HTTP client, or with a client
+        of this call only when start_sessions did not open one. Returns a dict video_id -> record and the URLs
+        that failed, these are left for the sessions. Removed or private videos are added to unavailable_ids.
+        """
+        fetched_records = {}
+        failed_urls = []
+        semaphore = asyncio.Semaphore(self.http_concurrency)
+
+        async def fetch(url):
+            async with semaphore:
+                try:
+                    with metrics.timer("api_request_seconds", api="tiktok_http"):
+                        video_info = await self.fetch_page_info(client, url)
+                except VideoUnavailable:
+                    metrics.inc("api_requests_total", api="tiktok_http", status="unavailable")
+                    self.unavailable_ids.add(self.extract_video_id(url))
+                    return
+                except httpx.HTTPError as e:
+                    metrics.inc("api_errors_total", api="tiktok_http", reason=type(e).__name__)
+                    video_info = None
+            try:
+                if video_info is not None:
+                    fetched_records[self.extract_video_id(url)] = self.video_record(url, video_info)
+                    metrics.inc("api_requests_total", api="tiktok_http", status="ok")
+                    return
+            except Exception as e:
+                print(f"Error reading the video page of {url}: {e}")
+            metrics.inc("api_requests_total", api="tiktok_http", status="fallback")
+            failed_urls.append(url)
+
+        if self.http_client is not None:
+            client = self.http_client
+            await asyncio.gather(*(fetch(url) for url in urls))
+        else:
+            async with self.open_http_client() as client:
+                await asyncio.gather(*(fetch(url) for url in urls))
+        return fetched_records, failed_urls
+
+    async def fetch_records(self, urls):
+        """Fetches the records of the URLs, from the video pages first when extraction is "http", the rest with the sessions."""
+        fetched_records = {}
+        if self.extraction == "http":
+            fetched_records, urls = await self.fetch_with_http(urls)
+            print(f"Read {len(fetched_records)} TikTok video pages, {len(urls)} videos are left for the sessions "
+                  f"({len(self.unavailable_ids)} removed or private videos so far).")
+
+        if urls:
+            # Reuse running sessions, otherwise start them only for this call (or until close_sessions when lazy)
+            owns_sessions = self.api is None and not self.lazy_sessions
+            if self.api is None or not self.healthy_sessions:
+                await self.restart_sessions()  # Also replaces sessions that an earlier call rotated out
+            try:
+                fetched_records.update(await self.fetch_with_sessions(urls))
+            finally:
+                if owns_sessions:
+                    await self.close_sessions()
+        return fetched_records
+
+    async def fetch_video_details(self, urls, search_hashtag_set):
+        """Fetches details for each TikTok video and returns a DataFrame."""
+        urls = list(urls)
+        records, stale = {}, {}
+        if self.cache is not None:
+            records, stale = self.cache.lookup("tiktok", [self.extract_video_id(url) for url in urls])
+        urls_to_fetch = list(dict.fromkeys(url for url in urls if self.extract_video_id(url) not in records
+                                           and self.extract_video_id(url) not in stale))
+        stale_urls = list(dict.fromkeys(url for url in urls if self.extract_video_id(url) in stale))
+        metrics.inc("cache_lookups_total", len(records), platform="tiktok", result="hit")
+        metrics.inc("cache_lookups_total", len(stale), platform="tiktok", result="stale")
+        metrics.inc("cache_lookups_total", len(urls_to_fetch), platform="tiktok", result="miss")
+        if records or stale:
+            print(f"Found {len(records) + len(stale)} videos in the cache, fetching {len(urls_to_fetch)} videos "
+                  f"and the statistics of {len(stale)} videos.")
+
+        fetched_records = {}
+        if urls_to_fetch:
+            fetched_records = await self.fetch_records(urls_to_fetch)
+
+        if self.cache is not None and fetched_records:
+            self.cache.put_many("tiktok", fetched_records)
+        records.update(fetched_records)
+
+        # The cached videos with expired counters keep their other fields, a video that could not be re-polled
+        # keeps its old counters unless it was removed
+        if stale_urls:
+            statistics = await self.fetch_statistics(stale_urls)
+            for video_id, record in stale.items():
+                if video_id in statistics:
+                    records[video_id] = {**record, **statistics[video_id]}
+                elif video_id not in self.unavailable_ids:
+                    records[video_id] = record
+
+        data_list = self.select_matching(urls, records, search_hashtag_set)
+        metrics.inc("videos_matched_total", len(data_list), platform="tiktok")
+        print(f"Total videos processed: {len(data_list)}")
         
         return pd.DataFrame(data_list)
+
+    async def fetch_statistics(self, urls):
+        """
+        Re-polls the statsV2 counters of known videos for the engagement snapshots, the cache is bypassed
+        but refreshed with the new records. Returns a dict video_id -> {views, likes, comments, shares}.
+        """
+        urls = list(dict.fromkeys(urls))
+        fetched_records = await self.fetch_records(urls)
+
+        if self.cache is not None and fetched_records:
+            self.cache.put_many("tiktok", fetched_records)
+        print(f"Re-polled the statistics of {len(fetched_records)} TikTok videos.")
+        return {video_id: {counter: record[counter] for counter in ("views", "likes", "comments", "shares")}
+                for video_id, record in fetched_records.items()}
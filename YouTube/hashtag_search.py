@@ -1,28 +1,39 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Make the shared utils folder importable
 import youtube_api as api
 import asyncio
 import pandas as pd
 import json
-import os
+from utils.video_cache import VideoCache
+from utils.quota import QuotaLedger
+from utils.hashtag_registry import register_hashtags
+from utils.pipeline import IncrementalCsvWriter, run_pipeline
+from utils.dataset_store import DatasetStore
+from utils.url_registry import UrlRegistry, new_run_id
+from utils.checkpoint import UrlCheckpoint
+from utils.metrics import metrics
 
 PLATFORM = 'youtube'
 COUNTRY = "NL"
 SEARCH_HASHTAG = "#ai"  # Change to the target hashtag
 TOTAL_VIDEOS_NEEDED = 250  # Number of videos to gather
+STREAMING = True  # Fetch the video details while scrolling instead of after scrolling
+RESUME = True  # Continue from the URLs of an interrupted run, False starts the scrape from zero
 
 TARGET_CSV = f'data/{PLATFORM}/{SEARCH_HASHTAG}/{SEARCH_HASHTAG}_{COUNTRY}.csv'
 TARGET_JSON = f'data/{PLATFORM}/{SEARCH_HASHTAG}/{SEARCH_HASHTAG}_{COUNTRY}.json'
 HASHTAG_JSON = f'data/hashtag_set.json'
+CACHE_PATH = 'data/video_cache.sqlite'
+QUOTA_LEDGER = 'data/youtube_quota.json'  # Quota use of the API key and the video IDs left when it ran out
+REGISTRY_PATH = 'data/url_registry.sqlite'
+STORE_PATH = 'data/store'  # Typed Parquet copy of all runs, partitioned by platform/hashtag/country
+STATE_PATH = f'data/session_state/{PLATFORM}_{COUNTRY}.json'  # Saved consent/captcha state, reused by the next run
+CHECKPOINT_PATH = f'data/checkpoints/{PLATFORM}/{SEARCH_HASHTAG}_{COUNTRY}.txt'  # Harvested URLs, removed when the run finished
 TARGET_FOLDER = f'data/{PLATFORM}/{SEARCH_HASHTAG}'
 
-with open(HASHTAG_JSON, 'r') as f:
-    hashtag_set = json.load(f)
-
-if SEARCH_HASHTAG not in hashtag_set:
-    hashtag_set.append(SEARCH_HASHTAG)
-
-# save new json with new hashtag
-with open(HASHTAG_JSON, 'w') as f:
-    json.dump(hashtag_set, f, indent=4)  
+# add the new hashtag to the json, the lock makes this safe when several runs start at once
+hashtag_set = register_hashtags([SEARCH_HASHTAG], path=HASHTAG_JSON)
 
 API_KEY = "..." # Fill in the API-key
 
@@ -34,7 +45,47 @@ async def main():
     os.makedirs(TARGET_FOLDER, exist_ok=True)
 
     # Create an instance of the YouTubeScraper class
-    scraper = api.YouTubeScraper(target_urls=TOTAL_VIDEOS_NEEDED, search_query=SEARCH_HASHTAG, headless=False)
+    scraper = api.YouTubeScraper(target_urls=TOTAL_VIDEOS_NEEDED, search_query=SEARCH_HASHTAG, headless=False,
+                                 state_path=STATE_PATH, checkpoint=UrlCheckpoint(CHECKPOINT_PATH, resume=RESUME))
+
+    # Create an instance of the YouTubeAPI class
+    youtube_api = api.YouTubeAPI(API_KEY, cache=VideoCache(CACHE_PATH), ledger=QuotaLedger(QUOTA_LEDGER))
+
+    # Keeps track of all scraped urls over all runs
+    registry = UrlRegistry(REGISTRY_PATH)
+    run_id = new_run_id()
+
+    if STREAMING:
+        # Fetch the details in batches of 50 URLs while the scraper is still scrolling
+        writer = IncrementalCsvWriter(TARGET_CSV)
+        frames = []
+
+        async def enrich(batch):
+            registry.register(batch, SEARCH_HASHTAG, COUNTRY, run_id)
+            df = await youtube_api.fetch_video_details_async(batch, search_hashtag_set=hashtag_set)
+            registry.mark_enriched(df.get('url', []))
+            df['country'] = COUNTRY
+            df['platform'] = PLATFORM
+            frames.append(df)
+            return df
+
+        # One pooled client for all batches, so the connections are kept alive between them
+        await youtube_api.start_client()
+        try:
+            await run_pipeline(scraper.stream_urls(), enrich, writer.write, batch_size=50)
+        finally:
+            await youtube_api.close_client()
+        writer.close()
+
+        # Export the URLs as JSON
+        with open(TARGET_JSON, 'w') as f:
+            json.dump(list(scraper.processed_urls), f)
+        scraper.checkpoint.complete()
+        if frames:
+            DatasetStore(STORE_PATH).write(pd.concat(frames, ignore_index=True), PLATFORM, SEARCH_HASHTAG, COUNTRY)
+
+        print("Video data saved successfully! in", TARGET_CSV)
+        return
 
     # Run the scrape function and retrieve the DataFrame
     urls = await scraper.scrape_urls()
@@ -42,12 +93,13 @@ async def main():
     # Export the URLs as JSON
     with open(TARGET_JSON, 'w') as f:
         json.dump(urls, f)
+    scraper.checkpoint.complete()
 
-    # Create an instance of the YouTubeAPI class
-    youtube_api = api.YouTubeAPI(API_KEY)
+    registry.register(urls, SEARCH_HASHTAG, COUNTRY, run_id)
 
     # Gather information about the URLs
-    df = youtube_api.fetch_video_details(urls, search_hashtag_set=hashtag_set)
+    df = await youtube_api.fetch_video_details_async(urls, search_hashtag_set=hashtag_set)
+    registry.mark_enriched(df.get('url', []))
 
     # add a column country with the value of COUNTRY
     df['country'] = COUNTRY
@@ -57,10 +109,14 @@ async def main():
 
     # Save to CSV
     df.to_csv(TARGET_CSV, index=False)
+    DatasetStore(STORE_PATH).write(df, PLATFORM, SEARCH_HASHTAG, COUNTRY)
 
     print("Video data saved successfully! in", TARGET_CSV)
 
 
 # Run everything inside an async event loop
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        asyncio.run(main())
+    finally:
+        metrics.export(script='hashtag_search', platform=PLATFORM, hashtag=SEARCH_HASHTAG, country=COUNTRY)
\ No newline at end of file
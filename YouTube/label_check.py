@@ -1,22 +1,41 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Make the shared utils folder importable
 import youtube_api as api  # Import the functions from youtube.py
 import pandas as pd
 import asyncio
+from utils.url_registry import UrlRegistry
+from utils.metrics import metrics
 
 INIT_CSV_PATH = 'data/merged_datasets_platforms/merged_dataset_with_youtube_labels.csv'
 COOKIES_JSON = 'YouTube/youtube_cookies.json'
 INVALID_PATH = 'data/youtube_invalid_urls.json'
+JOURNAL_PATH = 'data/merged_datasets_platforms/youtube_label_journal.sqlite'  # Results are resumed from here after a crash
+REGISTRY_PATH = 'data/url_registry.sqlite'
+NUM_WORKERS = 4  # Number of Shorts pages that are checked at the same time
+DETECTION = "http"  # Read the labels from the page HTML and only render the ambiguous pages, "browser" renders every page
 
 async def main():
     """
     Main function looks for the AI labels in the videos.
     """ 
     # Create an instance of the YouTube_label_check class
-    youtube_api = api.LabelCheckerYouTube(init_df_path=INIT_CSV_PATH, cookies=COOKIES_JSON, invalid_path = INVALID_PATH)
+    youtube_api = api.LabelCheckerYouTube(init_df_path=INIT_CSV_PATH, cookies=COOKIES_JSON, invalid_path = INVALID_PATH, num_workers=NUM_WORKERS, journal_path=JOURNAL_PATH, detection=DETECTION)
 
     await youtube_api.scrape_labels()
 
+    # Record the checked URLs in the registry, so they are not pending anymore
+    results = youtube_api.journal.results()
+    registry = UrlRegistry(REGISTRY_PATH)
+    for status, group in results.groupby('status'):
+        registry.mark_labeled(group['url'], status)
+    registry.close()
+
     print("Video data saved successfully! in", INIT_CSV_PATH)
 
 # Run everything inside an async event loop
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        asyncio.run(main())
+    finally:
+        metrics.export(script='label_check')
\ No newline at end of file
@@ -1,17 +1,142 @@
 import requests
+import httpx
 import pandas as pd
-import re
 import asyncio
 import random
-from playwright.async_api import async_playwright
+import time
+from utils.network import ResourceBlocker
+from utils.scroll import scroll_feed, smooth_scroll_up
+from utils.harvester import LinkHarvester
+from utils.browser_pool import BrowserPool
+from utils.hashtags import extract_hashtags, compile_hashtags
+from utils.quota import QuotaExceededError
+from utils.metrics import metrics, COUNT_BUCKETS
+from utils.pacing import PacingController, YieldModel
+from utils.atomic import atomic_write_json
+from utils.session_state import load_state, save_state, race_selectors, YOUTUBE_CONSENT_COOKIES
 import pandas as pd
 import urllib.parse  # Import this to encode URLs
+from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
 import json
+import os
+import sqlite3
+import datetime
+import re
 
 BASE_URL = "https://www.googleapis.com/youtube/v3"
 
+# Only the parts and fields that video_record uses are requested, contentDetails was never used
+VIDEO_PART = "snippet,statistics"
+VIDEO_FIELDS = "etag,items(id,snippet(title,description,publishedAt),statistics(viewCount,likeCount,commentCount))"
+# Re-polls of known videos only need the counters
+STATISTICS_PART = "statistics"
+STATISTICS_FIELDS = "etag,items(id,statistics(viewCount,likeCount,commentCount))"
+VIDEOS_LIST_COST = 1  # Quota units of one videos.list call, independent of the number of IDs
+RETRY_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "backendError"}
+QUOTA_REASONS = {"quotaExceeded", "dailyLimitExceeded"}
+
+# Resolves as soon as the metapanel of a Shorts page is visible and checks both AI label signals in one go.
+# The 'Altered or synthetic content' disclosure is shown for AI-generated posts that discuss sensitive topics
+# (elections, ongoing conflicts, public health crises or public officials), 'How this was made' for all labelled posts.
+DETECT_LABEL_JS = """
+() => {
+    const panel = document.querySelector('.ytReelMetapanelViewModelHost');
+    if (!panel) return null;
+    const rect = panel.getBoundingClientRect();
+    if (rect.width === 0 || rect.height === 0 || getComputedStyle(panel).visibility === 'hidden') return null;
+
+    const disclosure = Array.from(document.querySelectorAll('.ytwPlayerDisclosureViewModelText'))
+        .some(node => node.textContent.trim() === 'Altered or synthetic content');
+    const howThisWasMade = document.querySelector('.ytwHowThisWasMadeSectionViewModelHost') !== null;
+
+    let signal = 'none';
+    if (disclosure && howThisWasMade) signal = 'disclosure+how_this_was_made';
+    else if (disclosure) signal = 'disclosure';
+    else if (howThisWasMade) signal = 'how_this_was_made';
+
+    return {
+        ai_label: disclosure || howThisWasMade ? 1 : 0,
+        sensitive_topic: disclosure ? 1 : 0,
+        signal: signal
+    };
+}
+"""
+
+# The same two markers in the initial data that is embedded in the HTML of a Shorts page
+INITIAL_DATA_PATTERN = re.compile(r"(?:var ytInitialData|window\[\"ytInitialData\"\])\s*=\s*")
+SHORTS_OVERLAY_KEYS = ("reelPlayerOverlayRenderer", "reelMetapanelViewModel")  # Present once the Short itself is in the data
+HOW_THIS_WAS_MADE_KEY = "howThisWasMadeSectionViewModel"
+DISCLOSURE_KEY = "playerDisclosureViewModel"
+DISCLOSURE_TEXT = "Altered or synthetic content"
+LABEL_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:128.0) Gecko/20100101 Firefox/128.0",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+def extract_initial_data(html):
+    """Returns the ytInitialData object of a YouTube page, None when the page has none (e.g. a consent page)."""
+    match = INITIAL_DATA_PATTERN.search(html)
+    if not match:
+        return None
+    try:
+        data, _ = json.JSONDecoder().raw_decode(html, match.end())
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def detect_label_initial_data(data):
+    """
+    Detects the labels like DETECT_LABEL_JS does, but in the ytInitialData of the page.
+    Returns None when the result is ambiguous because the data does not contain the Short, the browser decides then.
+    """
+    keys = set()
+    disclosure = False
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            keys.update(node.keys())
+            if DISCLOSURE_KEY in node and DISCLOSURE_TEXT in json.dumps(node[DISCLOSURE_KEY]):
+                disclosure = True
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+
+    if not keys.intersection(SHORTS_OVERLAY_KEYS):
+        return None
+    how_this_was_made = HOW_THIS_WAS_MADE_KEY in keys
+
+    signal = 'none'
+    if disclosure and how_this_was_made:
+        signal = 'disclosure+how_this_was_made'
+    elif disclosure:
+        signal = 'disclosure'
+    elif how_this_was_made:
+        signal = 'how_this_was_made'
+    return {
+        "ai_label": 1 if disclosure or how_this_was_made else 0,
+        "sensitive_topic": 1 if disclosure else 0,
+        "signal": signal,
+    }
+
+
+def load_cookies(storage_state):
+    """Turns the cookies of a Playwright storage_state JSON file into httpx cookies."""
+    with open(storage_state, "r") as f:
+        state = json.load(f)
+    cookies = httpx.Cookies()
+    for cookie in state.get("cookies", []):
+        cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/"))
+    return cookies
+
+
+CONSENT_SELECTOR = "button:has-text('Reject the use of cookies and')"
+FEED_SELECTOR = "a[href*='/shorts/']"
+
 class YouTubeScraper:
-    def __init__(self, target_urls=50, min_scrolls=5, max_scroll_attempts = 100, search_query=None, headless = False):
+    def __init__(self, target_urls=50, min_scrolls=5, max_scroll_attempts = 100, search_query=None, headless = False, block_profile="feed", proxy=None, pacing=None, site_url="https://www.youtube.com", state_path=None, consent_timeout=15, checkpoint=None):
         self.target_urls = target_urls
         self.min_scrolls = min_scrolls
         self.max_scroll_attempts = max_scroll_attempts
@@ -19,140 +144,269 @@ class YouTubeScraper:
         self.search_query = search_query
         self.headless = headless
         self.scroll_attempts = 0
+        self.blocker = ResourceBlocker(block_profile)  # Blocks media, images, fonts and trackers
+        self.proxy = proxy  # Optional Playwright proxy settings, e.g. to scrape a country from a shared browser
+        self.pacing = pacing or {}  # Optional PacingController settings, e.g. {"max_wait": 6} for slow networks
+        self.pacer = None
+        self.site_url = site_url  # Site the hashtag page is opened on, a local stand-in for the benchmarks
+        self.state_path = state_path  # Saved consent cookies, so a warm run never sees the cookie banner
+        self.consent_timeout = consent_timeout  # Seconds to wait for the cookie banner or the first Shorts
+        self.checkpoint = checkpoint  # Optional UrlCheckpoint, every harvested URL is flushed to it right away
+        self.resumed_urls = list(checkpoint.urls) if checkpoint else []  # URLs of an interrupted earlier run
 
     def encode_search_query(self, search_query):
         """Deletes the # for youtube and make it lower case for the consistency."""
         search_query = search_query.lower()
         return urllib.parse.quote(search_query[1:])
 
-    async def scrape_urls(self):
-        """Scrapes YouTube Shorts URLs using proper scrolling."""
-        async with async_playwright() as p:
-            encoded_search_query = self.encode_search_query(self.search_query)
-            browser = await p.firefox.launch(headless=self.headless)  # Use firefox 
-            context = await browser.new_context(storage_state=None) # Incognito mode
-            page = await context.new_page()
-
-            search_url = f"https://www.youtube.com/hashtag/{encoded_search_query}/shorts"
-
-            print(f"Opening: {search_url}")
+    def format_url(self, href):
+        """Makes a full Shorts URL of an anchor href, returns None for other links."""
+        if href and "/shorts/" in href:
+            return f"https://www.youtube.com{href}"
+        metrics.inc("invalid_hrefs_total", platform="youtube")
+        return None
+
+    async def scrape_urls(self, pool=None):
+        """Scrapes YouTube Shorts URLs using proper scrolling, in a shared BrowserPool if one is given."""
+        return [url async for url in self.stream_urls(pool)]
+
+    async def stream_urls(self, pool=None):
+        """
+        Yields every newly found YouTube Shorts URL while scrolling, so it can be enriched right away.
+        The URLs of a resumed checkpoint are yielded first, the scraping continues until the target is reached.
+        """
+        for url in self.resumed_urls:
+            yield url
+        if len(self.resumed_urls) >= self.target_urls:
+            self.processed_urls = set(self.resumed_urls)
+            return
+
+        own_pool = pool is None
+        if own_pool:
+            pool = await BrowserPool(headless=self.headless, warm_contexts=0).start()  # Use firefox 
+        try:
+            # Incognito mode, apart from the saved consent cookies
+            async with pool.context(storage_state=load_state(self.state_path), proxy=self.proxy, reuse=False) as context:
+                async for url in self.stream_with_context(context):
+                    yield url
+        finally:
+            if own_pool:
+                await pool.close()
+
+    async def stream_with_context(self, context):
+        """Scrolls the hashtag page in the context and yields the new URLs."""
+        encoded_search_query = self.encode_search_query(self.search_query)
+        page = await context.new_page()
+        await self.blocker.attach(page)
+
+        search_url = f"{self.site_url}/hashtag/{encoded_search_query}/shorts"
+
+        print(f"Opening: {search_url}")
+        with metrics.timer("page_load_seconds", platform="youtube", page="feed"):
             await page.goto(search_url)
 
+        # Reject the cookies only when the banner is shown, a warm state goes straight to the Shorts
+        with metrics.timer("selector_wait_seconds", platform="youtube", selector="consent"):
+            shown = await race_selectors(page, {"consent": CONSENT_SELECTOR, "feed": FEED_SELECTOR},
+                                         timeout=self.consent_timeout)
+        if shown == "consent":
+            metrics.inc("consent_banners_total", platform="youtube")
             try:
-                await page.wait_for_selector("button:has-text('Reject the use of cookies and')", timeout=10000)
-                await page.get_by_role("button", name="Reject all").click()
+                await page.get_by_role("button", name="Reject all").click(timeout=self.consent_timeout * 1000)
                 print("Cookie rejection button clicked!")
-            except:
-                print("Cookie rejection button not found within 10 seconds.")
-
-            # Wait until the page is loaded and Shorts videos appear
+                if self.state_path:
+                    await page.wait_for_selector(FEED_SELECTOR, timeout=self.consent_timeout * 1000)
+                    await save_state(context, self.state_path, keep_cookies=YOUTUBE_CONSENT_COOKIES)
+            except PlaywrightError as e:
+                print(f"Could not reject the cookies, continuing without: {e}")
+        elif shown is None:
+            print(f"Neither the cookie banner nor Shorts appeared within {self.consent_timeout} seconds.")
+
+        # Wait until the page is loaded and Shorts videos appear
+        with metrics.timer("page_load_seconds", platform="youtube", page="feed_networkidle"):
             await page.wait_for_load_state("networkidle")  # Wait for network to be idle
-            await page.evaluate("document.body.style.zoom='50%'")  # Zoom out to 50%
-            # await page.wait_for_selector("a[href*='/shorts/']", timeout=15000)
-            print("Page loaded, starting scrolling...")
-
-            # Scroll Until Enough Videos Are Loaded
-            unique_results = set()
-            self.scroll_attempts = 0
-            no_new_shorts_count = 0  # Tracks how many times no new videos are found
-
-            while len(unique_results) < self.target_urls and self.scroll_attempts < self.max_scroll_attempts:
-                self.scroll_attempts += 1
-                previous_video_count = len(unique_results)
-
-                print(f"Scrolling... (Collected: {len(unique_results)}/{self.target_urls})")
-                await self.scroll_page(page)  # Use optimized scrolling
-
-                # Extract Shorts URLs
-                videos = await page.locator("a[href*='/shorts/']").all()
-                for video in videos:
-                    try:
-                        video_url = await video.get_attribute("href")
-                        if video_url and "/shorts/" in video_url:
-                            unique_results.add(video_url)
-                    except Exception as e:
-                        print(f"Error processing video: {e}")
-                        continue  
-
-                # Check if new Shorts were added
-                if len(unique_results) == previous_video_count:
-                    no_new_shorts_count += 1
-                    print(f"No new Shorts found ({no_new_shorts_count}/{self.min_scrolls}).")
-                else:
-                    no_new_shorts_count = 0  
-
-        
-                if no_new_shorts_count >= self.min_scrolls:
-                    print("No new Shorts found after multiple scrolls. Stopping scrolling.")
-                    break  
-
-            # FINAL CHECK: Process last batch of Shorts after scrolling stops
-            print("Performing final extraction of Shorts before exiting...")
-            final_videos = await page.locator("a[href*='/shorts/']").all()
-            for video in final_videos:
-                try:
-                    video_url = await video.get_attribute("href")
-                    if video_url and "/shorts/" in video_url:
-                        unique_results.add(video_url)
-                except Exception as e:
-                    print(f"Error processing final batch: {e}")
-                    continue  
-
-            print("Finished scrolling. Extracting Shorts links...")
-
-            # make a correct url of the unique results
-            unique_results = [f"https://www.youtube.com{path}" for path in unique_results]
-
-            # Save Unique Shorts URLs
-            results_list = list(unique_results)
-
-            await browser.close()
+        await page.evaluate("document.body.style.zoom='50%'")  # Zoom out to 50%
+        # await page.wait_for_selector("a[href*='/shorts/']", timeout=15000)
+        print("Page loaded, starting scrolling...")
+
+        # Collect the Shorts links inside the page, only new links are handed over after each scroll
+        harvester = LinkHarvester(page, FEED_SELECTOR)
+        await harvester.install()
+        self.pacer = PacingController(page, **self.pacing).attach()
+        yield_model = YieldModel(max_zero_streak=self.min_scrolls)
+
+        # Scroll Until Enough Videos Are Loaded
+        self.processed_urls = set(self.resumed_urls)
+        unique_results = self.processed_urls
+        self.scroll_attempts = 0
 
-            return results_list
+        while len(unique_results) < self.target_urls and self.scroll_attempts < self.max_scroll_attempts:
+            self.scroll_attempts += 1
+            previous_video_count = len(unique_results)
+
+            print(f"Scrolling... (Collected: {len(unique_results)}/{self.target_urls})")
+            with metrics.timer("scroll_seconds", platform="youtube"):
+                settled = await self.scroll_page(page)  # Waits until the feed delivered the new content
+
+            # Extract Shorts URLs
+            hrefs, new_urls = await harvester.collect(self.format_url, unique_results, self.checkpoint)
+            for video_url in new_urls:
+                yield video_url
+
+            # Number of new Shorts this scroll brought in
+            new_shorts = len(unique_results) - previous_video_count
+            metrics.observe("scroll_yield_urls", new_shorts, buckets=COUNT_BUCKETS, platform="youtube")
+            metrics.inc("urls_scraped_total", new_shorts, platform="youtube")
+
+            # Stop when the yield curve shows that the feed is exhausted
+            # After a resume the feed starts at the top again, links of the earlier run still show progress
+            yield_model.update(len(hrefs) if self.resumed_urls else new_shorts, settled)
+            if new_shorts == 0:
+                print(f"No new Shorts found ({yield_model.summary()}).")
+            if yield_model.should_stop():
+                print("No new Shorts found after multiple scrolls. Stopping scrolling.")
+                break
+
+        # FINAL CHECK: Process last batch of Shorts after scrolling stops
+        print("Performing final extraction of Shorts before exiting...")
+        _, new_urls = await harvester.collect(self.format_url, unique_results, self.checkpoint)
+        for video_url in new_urls:
+            yield video_url
+
+        print("Finished scrolling. Extracting Shorts links...")
+        print(self.blocker.summary())
 
     async def scroll_page(self, page, speed=10):
-        """Smoothly scrolls down the page with a variable speed."""
-        current_scroll_position = await page.evaluate(
-            "() => document.documentElement.scrollTop || document.body.scrollTop;")
-        total_height = await page.evaluate(
-            "() => document.documentElement.scrollHeight || document.body.scrollHeight;")
-
-        # Scroll between 30-50% of the total page height
-        scroll_distance = random.randint(int(total_height * 0.3), int(total_height * 0.5))
-        target_position = current_scroll_position + scroll_distance
-
-        print(f"Scrolling from {current_scroll_position} to {target_position} / {total_height}")
-
-        while current_scroll_position < target_position:
-            step = speed + random.randint(-speed, speed)  # Randomized scroll speed
-            current_scroll_position += step
-            await page.evaluate(f"() => window.scrollTo(0, {current_scroll_position});")
-            await asyncio.sleep(random.uniform(0.02, 0.1))  # Short pauses for smooth effect
-
-        # Extra delay to allow YouTube to load new content
-        await asyncio.sleep(random.uniform(2, 4))  
-
-        # Pause briefly every 5 scrolls to make it not too agressive
-        if self.scroll_attempts % 5 == 0:
-            print("Pausing briefly to make it not too agressive...")
-            await asyncio.sleep(random.uniform(5, 8))
+        """Smoothly scrolls down 30-50% of the page height with a variable speed and waits for the new content."""
+        return await scroll_feed(page, self.pacer, self.scroll_attempts, 0.3, 0.5, speed)
 
     async def slight_scroll_up(self, page, speed=10):
         """Smoothly scrolls up slightly to refresh content."""
-        desired_scroll = -300  # Amount to scroll up
-        current_scroll = 0
+        await smooth_scroll_up(page, 300, speed)
+
+class YouTubeAPIError(Exception):
+    """Raised when the YouTube Data API returns an error that retrying does not solve, e.g. an invalid key."""
 
-        print(f"Smooth scrolling up by {desired_scroll} pixels")
 
-        while current_scroll > desired_scroll:
-            step = speed + random.randint(-speed, speed)  # Randomized speed for a natural effect
-            current_scroll -= step
-            await page.evaluate(f"() => window.scrollBy(0, {-step});")
-            await asyncio.sleep(random.uniform(0.02, 0.1))  # Short pauses for smooth effect
+class YouTubeDataClient:
+    """
+    Client for the videos endpoint of the YouTube Data API that counts the quota units it spends,
+    requests partial responses, re-polls a batch with its ETag and backs off on rate limit and server errors.
+    When the quota is used up it raises QuotaExceededError and sends no further requests.
+    """
+    def __init__(self, api_key, base_url=BASE_URL, ledger=None, max_retries=5, etags=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.ledger = ledger  # optional QuotaLedger shared with other runs on the same key
+        self.max_retries = max_retries
+        self.units_used = 0
+        self.request_count = 0
+        self.not_modified = 0
+        self.quota_exceeded = ledger is not None and ledger.exhausted()
+        # (part, fields, ids) -> (etag, response data) of the last response, an EtagStore keeps them over runs
+        self.etags = etags if etags is not None else {}
+
+    def video_params(self, video_ids, part=VIDEO_PART, fields=VIDEO_FIELDS):
+        return {"part": part, "fields": fields, "id": ",".join(video_ids), "key": self.api_key}
+
+    def request_headers(self, key):
+        cached = self.etags.get(key)
+        if cached is not None:
+            return {"If-None-Match": cached[0]}
+        return {}
+
+    def error_reason(self, data):
+        try:
+            return data["error"]["errors"][0]["reason"]
+        except (KeyError, IndexError, TypeError):
+            return None
+
+    def handle_response(self, key, video_ids, response, attempt):
+        """Returns the response data, or the number of seconds to wait before retrying."""
+        self.request_count += 1
+        metrics.inc("api_requests_total", api="youtube", status=response.status_code)
+        data = {}
+        if response.status_code != 304:
+            try:
+                data = response.json()
+            except ValueError:
+                pass
+        reason = self.error_reason(data)
+
+        # A request that is refused because the quota is used up costs no quota
+        if reason not in QUOTA_REASONS:
+            self.units_used += VIDEOS_LIST_COST
+            metrics.inc("api_quota_units_total", VIDEOS_LIST_COST, api="youtube")
+            if self.ledger is not None:
+                self.ledger.add(VIDEOS_LIST_COST)
+
+        if response.status_code == 304:
+            self.not_modified += 1
+            return self.etags.get(key)[1]
+        if response.status_code == 200:
+            if "etag" in data:
+                self.etags[key] = (data["etag"], data)
+            return data
+
+        if reason in QUOTA_REASONS:
+            metrics.inc("api_errors_total", api="youtube", reason=reason)
+            self.quota_exceeded = True
+            if self.ledger is not None:
+                self.ledger.mark_exhausted(video_ids)
+            raise QuotaExceededError(f"YouTube API quota exceeded after {self.units_used} units", video_ids)
+        if (response.status_code == 429 or response.status_code >= 500 or reason in RETRY_REASONS) \
+                and attempt < self.max_retries:
+            metrics.inc("api_retries_total", api="youtube", reason=reason or response.status_code)
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+            return min(2 ** attempt, 60) + random.uniform(0, 1)
+        metrics.inc("api_errors_total", api="youtube", reason=reason or response.status_code)
+        raise YouTubeAPIError(f"YouTube API request failed with {response.status_code} ({reason})")
+
+    def check_quota(self, video_ids):
+        if self.quota_exceeded:
+            raise QuotaExceededError("YouTube API quota is used up, no requests are sent", video_ids)
+
+    def list_videos(self, video_ids, part=VIDEO_PART, fields=VIDEO_FIELDS):
+        """Fetches one batch of at most 50 video IDs with requests."""
+        key = (part, fields, tuple(video_ids))
+        for attempt in range(self.max_retries + 1):
+            self.check_quota(video_ids)
+            with metrics.timer("api_request_seconds", api="youtube"):
+                response = requests.get(f"{self.base_url}/videos", params=self.video_params(video_ids, part, fields),
+                                        headers=self.request_headers(key), timeout=30)
+            result = self.handle_response(key, video_ids, response, attempt)
+            if isinstance(result, dict):
+                return result
+            time.sleep(result)
+
+    async def list_videos_async(self, client, video_ids, part=VIDEO_PART, fields=VIDEO_FIELDS):
+        """Fetches one batch of at most 50 video IDs with a pooled httpx client (base_url is set on the client)."""
+        key = (part, fields, tuple(video_ids))
+        for attempt in range(self.max_retries + 1):
+            self.check_quota(video_ids)
+            with metrics.timer("api_request_seconds", api="youtube"):
+                response = await client.get("/videos", params=self.video_params(video_ids, part, fields),
+                                            headers=self.request_headers(key))
+            result = self.handle_response(key, video_ids, response, attempt)
+            if isinstance(result, dict):
+                return result
+            await asyncio.sleep(result)
+
+    def summary(self):
+        return (f"YouTube API: {self.request_count} requests, {self.units_used} quota units, "
+                f"{self.not_modified} not modified")
+
 
 class YouTubeAPI:
-    def __init__(self, api_key):
+    def __init__(self, api_key, cache=None, ledger=None, base_url=BASE_URL, etags=None):
         self.api_key = api_key
+        self.cache = cache  # optional VideoCache, only cache misses are requested from the API
+        self.ledger = ledger  # optional QuotaLedger, keeps the quota use and the pending IDs over runs
+        self.client = YouTubeDataClient(api_key, base_url=base_url, ledger=ledger, etags=etags)
+        self.pending_ids = []  # Video IDs that could not be fetched because the quota was used up
+        self.http_client = None  # Pooled client of the API, kept open between start_client and close_client
 
     def extract_video_id(self, url):
         """Extracts video ID from a YouTube Shorts URL."""
@@ -160,133 +414,542 @@ class YouTubeAPI:
     
     def extract_hashtags(self, text):
         """Extracts hashtags from a text (title/description)."""
-        return re.findall(r"#\w+", text) if text else []
+        return extract_hashtags(text)
+
+    def stats_record(self, item):
+        """Returns the counters of a video item, None for a hidden counter (e.g. hidden likes)."""
+        stats = item.get("statistics", {})
+        return {"views": stats.get("viewCount"), "likes": stats.get("likeCount"), "comments": stats.get("commentCount")}
+
+    def video_record(self, item):
+        """Turns a video item of the API response into a record."""
+        stats = item.get("statistics", {})
+        snippet = item["snippet"]
+        return {
+            "url": f"https://www.youtube.com/shorts/{item['id']}",
+            "views": stats.get("viewCount", 0),
+            "likes": stats.get("likeCount", 0),
+            "comments": stats.get("commentCount", 0),
+            "publishedAt": snippet["publishedAt"],
+            "hashtags": self.extract_hashtags(snippet["title"]) + self.extract_hashtags(snippet["description"]) # keep as list
+        }
+
+    def select_matching(self, video_ids, records, matcher):
+        """Returns the records (in the order of video_ids) that contain one of the search hashtags."""
+        video_details = []
+        seen_urls = set()
+        for video_id in video_ids:
+            record = records.get(video_id)
+            if record is None:
+                continue
+            # Filter: Only include if the search term is present
+            if matcher.matches(record["hashtags"]):
+                if record["url"] not in seen_urls:  # Check whether the URL is already in the list
+                    seen_urls.add(record["url"])
+                    video_details.append(record)
+        return video_details
+
+    def cached_records(self, video_ids):
+        """
+        Returns the cached records, the cached records with expired counters (only their statistics are re-polled)
+        and the video IDs that still have to be fetched.
+        """
+        if self.cache is None:
+            return {}, {}, list(dict.fromkeys(video_ids))
+        records, stale = self.cache.lookup("youtube", video_ids)
+        missing_ids = [video_id for video_id in dict.fromkeys(video_ids) if video_id not in records and video_id not in stale]
+        metrics.inc("cache_lookups_total", len(records), platform="youtube", result="hit")
+        metrics.inc("cache_lookups_total", len(stale), platform="youtube", result="stale")
+        metrics.inc("cache_lookups_total", len(missing_ids), platform="youtube", result="miss")
+        return records, stale, missing_ids
+
+    def refresh_stale(self, stale, statistics):
+        """
+        Puts the re-polled counters into the cached records with expired counters. A video that the API did not
+        return (e.g. removed) is left out, unless the quota ran out first, then it keeps its old counters.
+        Returns the refreshed records (for the cache) and all records.
+        """
+        refreshed = {
+            video_id: {**record, **{counter: 0 if value is None else value
+                                    for counter, value in statistics[video_id].items()}}
+            for video_id, record in stale.items() if video_id in statistics
+        }
+        kept = {video_id: record for video_id, record in stale.items()
+                if video_id not in statistics and video_id in self.pending_ids}
+        return refreshed, {**kept, **refreshed}
+
+    def store_records(self, records):
+        if self.cache is not None and records:
+            self.cache.put_many("youtube", records)
+
+    def record_pending(self, video_ids):
+        """
+        Keeps the video IDs that were not fetched because the quota was used up, nothing is dropped silently.
+        The ledger keeps them for the next run, also the ones of batches that were never sent.
+        """
+        self.pending_ids = list(dict.fromkeys([*self.pending_ids, *video_ids]))
+        if self.ledger is not None:
+            self.ledger.add_pending(video_ids)
+        metrics.set("quota_pending_videos", len(self.pending_ids), api="youtube")
+        print(f"YouTube API quota exceeded, {len(self.pending_ids)} videos are pending until the quota resets.")
+
+    def store_fetched(self, fetched_records):
+        self.store_records(fetched_records)
+        if self.ledger is not None:
+            self.ledger.remove_pending(fetched_records)
+
+    def pending_first(self, items, key=None):
+        """
+        Orders the video IDs (or URLs, with key=extract_video_id) with the ones the ledger kept as pending first,
+        so they are retried before the quota runs out again.
+        """
+        if self.ledger is None:
+            return list(items)
+        pending = set(self.ledger.pending_ids())
+        key = key or (lambda item: item)
+        return sorted(items, key=lambda item: key(item) not in pending)
 
     def fetch_video_details(self, urls, search_hashtag_set):
         """Fetches additional video details using the YouTube API."""
         video_ids = [self.extract_video_id(url) for url in urls if self.extract_video_id(url)]
-
-        search_hashtags_lower = [] 
-
-        for search_hashtag in search_hashtag_set:
-            # Convert the search term to lowercase for case-insensitive matching
-            search_hashtags_lower.append(search_hashtag.lower())
+        matcher = compile_hashtags(search_hashtag_set)
 
         if not video_ids:
             print("No valid video IDs found.")
-            return []
+            return pd.DataFrame()
 
-        video_details = []
-        request_count = 0
-
-        for i in range(0, len(video_ids), 50):
-            video_ids_batch = video_ids[i:i + 50]
-            params = {
-                "part": "snippet, statistics,contentDetails",
-                "id": ",".join(video_ids_batch), 
-                "key": self.api_key
-            }
-            response = requests.get(f"{BASE_URL}/videos", params=params)
-            data = response.json()
-            request_count += 1
+        records, stale, missing_ids = self.cached_records(video_ids)
+        fetched_records = {}
+
+        for i in range(0, len(missing_ids), 50):
+            video_ids_batch = missing_ids[i:i + 50]
+            try:
+                data = self.client.list_videos(video_ids_batch)
+            except QuotaExceededError:
+                self.record_pending(missing_ids[i:])
+                break
 
             for item in data.get("items", []):
-                video_id = item["id"]
-                stats = item.get("statistics", {})
-                snippet = item["snippet"]
-                hashtags = self.extract_hashtags(snippet["title"]) + self.extract_hashtags(snippet["description"])
-                hashtags_lower = [tag.lower() for tag in hashtags]  # Convert all hashtags to lowercase
-
-                # Filter: Only include if the search term is present
-                if any(search_hashtag in hashtags_lower for search_hashtag in search_hashtags_lower):
-                    if f"https://www.youtube.com/shorts/{video_id}" not in {entry["url"] for entry in video_details}:  # Check whether the URL is already in the list
-                        video_details.append({
-                            "url": f"https://www.youtube.com/shorts/{video_id}",
-                            "views": stats.get("viewCount", 0),
-                            "likes": stats.get("likeCount", 0),
-                            "comments": stats.get("commentCount", 0),
-                            "publishedAt": snippet["publishedAt"],
-                            "hashtags": hashtags # keep as list
-                        })
-
-        # print(f"Retrieved {len(video_details)} valid Shorts in {request_count} API requests.")
+                fetched_records[item["id"]] = self.video_record(item)
+
+        # The cached videos with expired counters only get their statistics re-polled
+        stale_ids = sorted(stale)
+        statistics = {}
+        for i in range(0, len(stale_ids), 50):
+            try:
+                data = self.client.list_videos(stale_ids[i:i + 50], STATISTICS_PART, STATISTICS_FIELDS)
+            except QuotaExceededError:
+                self.record_pending(stale_ids[i:])
+                break
+            for item in data.get("items", []):
+                statistics[item["id"]] = self.stats_record(item)
+        refreshed, stale_records = self.refresh_stale(stale, statistics)
+
+        self.store_fetched({**fetched_records, **refreshed})
+        records.update(fetched_records)
+        records.update(stale_records)
+
+        video_details = self.select_matching(video_ids, records, matcher)
+        metrics.inc("videos_matched_total", len(video_details), platform="youtube")
+        print(self.client.summary())
         return pd.DataFrame(video_details)
 
+    def open_http_client(self, max_concurrency=8):
+        limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+        return httpx.AsyncClient(base_url=self.client.base_url, limits=limits, timeout=30)
+
+    async def start_client(self, max_concurrency=8):
+        """
+        Opens one pooled keep-alive client that every call uses until close_client is called,
+        so a pipeline that enriches batch after batch does not reconnect for each batch.
+        """
+        if self.http_client is None:
+            self.http_client = self.open_http_client(max_concurrency)
+
+    async def close_client(self):
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+
+    async def fetch_video_details_async(self, urls, search_hashtag_set, max_concurrency=8):
+        """
+        Fetches the same video details as fetch_video_details, but sends the 50-ID batches
+        concurrently (at most max_concurrency at a time) over the client of start_client, or over
+        a pooled keep-alive client of this call only, so it does not block the event loop while
+        other platforms are being enriched.
+        """
+        video_ids = [self.extract_video_id(url) for url in urls if self.extract_video_id(url)]
+        matcher = compile_hashtags(search_hashtag_set)
+
+        if not video_ids:
+            print("No valid video IDs found.")
+            return pd.DataFrame()
+
+        records, stale, missing_ids = self.cached_records(video_ids)
+        batches = [missing_ids[i:i + 50] for i in range(0, len(missing_ids), 50)]
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch_batch(video_ids_batch):
+            async with semaphore:
+                return await self.client.list_videos_async(client, video_ids_batch)
+
+        if self.http_client is not None:
+            client = self.http_client
+            results = await asyncio.gather(*(fetch_batch(batch) for batch in batches), return_exceptions=True)
+        else:
+            async with self.open_http_client(max_concurrency) as client:
+                results = await asyncio.gather(*(fetch_batch(batch) for batch in batches), return_exceptions=True)
+
+        fetched_records = {}
+        errors = []
+        for batch, data in zip(batches, results):
+            if isinstance(data, QuotaExceededError):
+                self.record_pending(batch)
+                continue
+            if isinstance(data, BaseException):
+                errors.append(data)
+                continue
+            for item in data.get("items", []):
+                fetched_records[item["id"]] = self.video_record(item)
+
+        # Keep what was fetched before raising, so a rerun only requests the rest
+        self.store_fetched(fetched_records)
+        if errors:
+            raise errors[0]
+        records.update(fetched_records)
+
+        # The cached videos with expired counters only get their statistics re-polled
+        if stale:
+            refreshed, stale_records = self.refresh_stale(stale, await self.fetch_statistics(stale, max_concurrency))
+            self.store_fetched(refreshed)
+            records.update(stale_records)
+
+        video_details = self.select_matching(video_ids, records, matcher)
+        metrics.inc("videos_matched_total", len(video_details), platform="youtube")
+        print(f"Retrieved {len(video_details)} valid Shorts in {len(batches)} batches "
+              f"({len(video_ids) - len(missing_ids)} from the cache, {len(stale)} with re-polled statistics). "
+              f"{self.client.summary()}")
+        return pd.DataFrame(video_details)
+
+    async def fetch_statistics(self, video_ids, max_concurrency=8):
+        """
+        Re-polls only the statistics of known videos, 50 IDs per call, for the engagement snapshots.
+        Returns a dict video_id -> {views, likes, comments}, videos that were not returned are left out.
+        The IDs are sorted, so the same videos give the same batches and their ETags match in the next poll.
+        """
+        video_ids = sorted(set(video_ids))
+        batches = [video_ids[i:i + 50] for i in range(0, len(video_ids), 50)]
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch_batch(video_ids_batch):
+            async with semaphore:
+                return await self.client.list_videos_async(client, video_ids_batch, STATISTICS_PART, STATISTICS_FIELDS)
+
+        if self.http_client is not None:
+            client = self.http_client
+            results = await asyncio.gather(*(fetch_batch(batch) for batch in batches), return_exceptions=True)
+        else:
+            async with self.open_http_client(max_concurrency) as client:
+                results = await asyncio.gather(*(fetch_batch(batch) for batch in batches), return_exceptions=True)
+
+        statistics = {}
+        for batch, data in zip(batches, results):
+            if isinstance(data, QuotaExceededError):
+                self.record_pending(batch)
+                continue
+            if isinstance(data, BaseException):
+                raise data
+            for item in data.get("items", []):
+                statistics[item["id"]] = self.stats_record(item)
+        if self.ledger is not None:
+            self.ledger.remove_pending(statistics)
+        print(f"Re-polled the statistics of {len(statistics)} Shorts. {self.client.summary()}")
+        return statistics
+
+
+class LabelJournal:
+    """
+    Append-only SQLite journal of label check results, so a run does not rewrite the whole CSV per URL.
+    Results are buffered and written in batches of flush_every.
+    """
+    def __init__(self, path, flush_every=25):
+        self.path = path
+        self.flush_every = flush_every
+        self.buffer = []
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS label_results (
+                url TEXT PRIMARY KEY,
+                ai_label INTEGER,
+                sensitive_topic INTEGER,
+                status TEXT NOT NULL,
+                checked_at TEXT NOT NULL,
+                signal TEXT
+            )""")
+        # Journals written before the signal column existed
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(label_results)")]
+        if 'signal' not in columns:
+            self.conn.execute("ALTER TABLE label_results ADD COLUMN signal TEXT")
+        self.conn.commit()
+
+    def record(self, url, ai_label, sensitive_topic, status, signal=None):
+        """Adds a result ('ok' or 'invalid') to the buffer and flushes when the buffer is full."""
+        checked_at = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.buffer.append((url, ai_label, sensitive_topic, status, checked_at, signal))
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.conn.executemany("INSERT OR REPLACE INTO label_results VALUES (?, ?, ?, ?, ?, ?)", self.buffer)
+            self.conn.commit()
+            self.buffer = []
+
+    def results(self):
+        """Returns all journaled results as a DataFrame."""
+        self.flush()
+        return pd.read_sql_query("SELECT * FROM label_results", self.conn)
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
 
 class LabelCheckerYouTube:
-    def __init__(self, init_df_path, cookies, invalid_path, headless=False):
+    def __init__(self, init_df_path, cookies, invalid_path, headless=False, num_workers=4, journal_path=None,
+                 block_profile="label", detection="browser", http_concurrency=32, max_page_retries=2):
         self.init_df_path = init_df_path
         self.init_df = pd.read_csv(self.init_df_path)
         self.target_df = self.init_df.copy()
         self.headless = headless
         self.cookies = cookies
         self.invalid_path = invalid_path
+        self.num_workers = num_workers  # Number of pages that check URLs at the same time
+        self.blocker = ResourceBlocker(block_profile)  # Shared by all pages, so the counters cover the whole run
+        # "http" reads the labels from the page HTML first and only renders the ambiguous pages, "browser" renders all
+        self.detection = detection
+        self.http_concurrency = http_concurrency  # Number of Shorts pages fetched over HTTP at the same time
+        self.max_page_retries = max_page_retries  # Retries of a URL whose page failed, it is left unchecked after them
         with open(self.invalid_path, "r") as f:
             self.invalid_urls = json.load(f)        
 
-    async def scrape_labels(self):
-        """Scrapes YouTube Shorts AI Label."""
-        async with async_playwright() as p:
-            browser = await p.firefox.launch(headless=self.headless)  # Use firefox 
-            context = await browser.new_context(storage_state=self.cookies) # use cookies 
-            page = await context.new_page()
-
-            amount_checked_urls = 0
-
-            # if a row does not have a label yet, check the url
-            youtube_urls = self.init_df[(self.init_df['platform'] == 'youtube') & (self.init_df['ai_label'].isna())]
-            
-            print('starting to check urls for AI labels')
-            
-            # urls_to_check = [url for url in youtube_urls['url'] if url not in self.invalid_urls]
-            urls_to_check = [url for url in youtube_urls['url'] if url not in self.invalid_urls]
-            print (f"Found {len(urls_to_check)} URLs to check for AI labels.")
-            for url in urls_to_check:
-                amount_checked_urls += 1
-                
-                # Go to the YouTube Shorts URL
-                await page.goto(url)
-
-                try:
-                    # Wait until the content div is visible
-                    await page.wait_for_selector('.ytReelMetapanelViewModelHost', state='visible', timeout=20000)
-
-                    # Retrieve the inner HTML of the content div
-                    full_html = await page.content()
-
-                    # check if the class 'ytwPlayerDisclosureViewModelHost' exists, this is a AI-generated post where content discusses sensitive topics, such as elections, ongoing conflicts and public health crises, or public officials
-                    if '<span class="ytwPlayerDisclosureViewModelText">Altered or synthetic content</span>' in full_html:
-                        sensitive_topic = 1
-                        label = 1
-                    else:
-                        sensitive_topic = 0
-
-                    # Check if the class 'ytwHowThisWasMadeSectionViewModelHost' exists within the metadata container
-                    if 'ytwHowThisWasMadeSectionViewModelHost' in full_html:
-                        label = 1
-                    else:
-                        label = 0
-
-                    # add the label to the dataframe
-                    self.target_df.loc[self.target_df['url'] == url, 'ai_label'] = label
-                    self.target_df.loc[self.target_df['url'] == url, 'sensitive_topic'] = sensitive_topic
-
-                    if amount_checked_urls % 50 == 0:
-                        print(f'Checked {amount_checked_urls} urls for AI labels')
-                    
-                    self.target_df.to_csv(self.init_df_path, index=False)
-                except:
-                    print(f"Error processing video: {url}")
-                    # Add the new URL if it's not already in the list
-                    if url not in self.invalid_urls:
-                        self.invalid_urls.append(url)
-
-                        # Save the updated list
-                        with open(self.invalid_path, "w") as f:
-                            json.dump(self.invalid_urls, f)
-                    continue
-
-            # Close the browser
-            await browser.close()
+        # Results are journaled while checking and folded back into the CSV at the end
+        if journal_path is None:
+            journal_path = os.path.splitext(self.init_df_path)[0] + '_journal.sqlite'
+        self.journal = LabelJournal(journal_path)
+        self.resume_from_journal()
+
+    def resume_from_journal(self):
+        """Applies the results of earlier (possibly crashed) runs, so those URLs are not checked again."""
+        results = self.journal.results()
+        if results.empty:
+            return
+        self.apply_results(results)
+        print(f"Resumed {len(results)} label check results from {self.journal.path}")
+
+    def apply_results(self, results):
+        """Merges the journaled results into target_df and the invalid URL list."""
+        checked = results[results['status'] == 'ok'].set_index('url')
+        mask = self.target_df['url'].isin(checked.index)
+        self.target_df.loc[mask, 'ai_label'] = self.target_df.loc[mask, 'url'].map(checked['ai_label'])
+        self.target_df.loc[mask, 'sensitive_topic'] = self.target_df.loc[mask, 'url'].map(checked['sensitive_topic'])
+
+        known_invalid = set(self.invalid_urls)
+        for url in results.loc[results['status'] == 'invalid', 'url']:
+            if url not in known_invalid:
+                known_invalid.add(url)
+                self.invalid_urls.append(url)
+
+    def compact(self):
+        """Folds the journal back into the CSV and the invalid URL JSON, both are replaced atomically."""
+        self.apply_results(self.journal.results())
+
+        tmp_csv = self.init_df_path + '.tmp'
+        self.target_df.to_csv(tmp_csv, index=False)
+        os.replace(tmp_csv, self.init_df_path)
+
+        atomic_write_json(self.invalid_path, self.invalid_urls)
+
+    async def check_url(self, page, url):
+        """
+        Visits a YouTube Shorts URL and returns a dict with ai_label, sensitive_topic and the signal that fired,
+        None when the metapanel never appears (an invalid URL). The detection runs inside the page,
+        so the page HTML is never copied to Python.
+        """
+        # Go to the YouTube Shorts URL
+        with metrics.timer("page_load_seconds", platform="youtube", page="short"):
+            await page.goto(url)
+
+        # Wait until the metapanel is visible and detect the labels in the same evaluation
+        with metrics.timer("selector_wait_seconds", platform="youtube", selector="metapanel"):
+            try:
+                handle = await page.wait_for_function(DETECT_LABEL_JS, timeout=20000)
+            except PlaywrightTimeoutError:
+                return None
+        return await handle.json_value()
+
+    async def check_url_http(self, client, url):
+        """Fetches a Shorts page without rendering it and detects the labels, None when the browser has to decide."""
+        with metrics.timer("page_load_seconds", platform="youtube", page="short_http"):
+            response = await client.get(url)
+        if response.status_code != 200:
+            return None
+        data = extract_initial_data(response.text)
+        return None if data is None else detect_label_initial_data(data)
+
+    async def http_worker(self, client, url_queue, result_queue, ambiguous):
+        """Takes URLs from the shared queue and checks them over HTTP, ambiguous URLs are kept for the browser."""
+        while True:
+            try:
+                url = url_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            metrics.set("queue_depth", url_queue.qsize(), queue="label_urls_http")
 
+            try:
+                result = await self.check_url_http(client, url)
+            except httpx.HTTPError as e:
+                metrics.inc("label_errors_total", error=type(e).__name__)
+                result = None
+            if result is None:
+                metrics.inc("labels_ambiguous_total", platform="youtube")
+                ambiguous.append(url)
+            else:
+                await result_queue.put((url, result))
+
+    async def check_urls_http(self, urls_to_check):
+        """Checks the URLs with a pooled HTTP client with the same cookies, returns the URLs that need the browser."""
+        url_queue = asyncio.Queue()
+        for url in urls_to_check:
+            url_queue.put_nowait(url)
+        result_queue = asyncio.Queue(maxsize=100)
+        ambiguous = []
+
+        limits = httpx.Limits(max_connections=self.http_concurrency, max_keepalive_connections=self.http_concurrency)
+        writer = asyncio.create_task(self.result_writer(result_queue))
+        try:
+            async with httpx.AsyncClient(cookies=load_cookies(self.cookies), headers=LABEL_HEADERS, limits=limits,
+                                         follow_redirects=True, timeout=30) as client:
+                await asyncio.gather(*(self.http_worker(client, url_queue, result_queue, ambiguous)
+                                       for _ in range(self.http_concurrency)))
+        finally:
+            # Let the writer store everything that was checked before stopping
+            await result_queue.put(None)
+            await writer
+
+        print(f"Checked {len(urls_to_check) - len(ambiguous)} URLs over HTTP, {len(ambiguous)} need the browser.")
+        return ambiguous
+
+    async def new_label_page(self, context):
+        page = await context.new_page()
+        await self.blocker.attach(page)
+        return page
+
+    async def label_worker(self, context, url_queue, result_queue):
+        """
+        Takes URLs from the shared queue and checks them on its own page. Only a URL whose metapanel never appears
+        is invalid, after a navigation error or a crashed page the page is replaced and the URL goes back on the queue.
+        """
+        page = await self.new_label_page(context)
+        while True:
+            try:
+                url, attempts = url_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            metrics.set("queue_depth", url_queue.qsize(), queue="label_urls")
 
+            try:
+                result = await self.check_url(page, url)
+            except Exception as e:
+                metrics.inc("label_errors_total", error=type(e).__name__)
+                if attempts < self.max_page_retries:
+                    url_queue.put_nowait((url, attempts + 1))
+                else:
+                    print(f"Error processing video, left unchecked for the next run: {url} ({e})")
+                try:
+                    await page.close()
+                except PlaywrightError:
+                    pass  # The page already crashed
+                page = await self.new_label_page(context)
+                continue
+            if result is None:
+                print(f"Error processing video: {url}")
+            await result_queue.put((url, result))
+        await page.close()
+
+    async def result_writer(self, result_queue):
+        """Single writer that appends the results of all workers to the journal."""
+        amount_checked_urls = 0
+        while True:
+            result = await result_queue.get()
+            if result is None:
+                break
+            url, label_result = result
+            amount_checked_urls += 1
+            metrics.set("queue_depth", result_queue.qsize(), queue="label_results")
+
+            if label_result is None:
+                metrics.inc("labels_checked_total", status="invalid")
+                self.journal.record(url, None, None, 'invalid')
+                continue
+
+            metrics.inc("labels_checked_total", status="ok")
+            metrics.inc("labels_found_total", signal=label_result['signal'])
+            self.journal.record(url, label_result['ai_label'], label_result['sensitive_topic'], 'ok',
+                                signal=label_result['signal'])
+
+            if amount_checked_urls % 50 == 0:
+                print(f'Checked {amount_checked_urls} urls for AI labels')
+        self.journal.flush()
+
+    async def check_urls(self, context, urls_to_check):
+        """Checks the URLs with num_workers pages of the context and one writer."""
+        url_queue = asyncio.Queue()
+        for url in urls_to_check:
+            url_queue.put_nowait((url, 0))
+        result_queue = asyncio.Queue(maxsize=100)
+
+        writer = asyncio.create_task(self.result_writer(result_queue))
+        workers = [asyncio.create_task(self.label_worker(context, url_queue, result_queue))
+                   for _ in range(self.num_workers)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            # Let the writer store everything that was checked before stopping
+            await result_queue.put(None)
+            await writer
+
+    async def scrape_labels(self, pool=None):
+        """Scrapes YouTube Shorts AI Label with num_workers pages that share the cookies, in a shared BrowserPool if one is given."""
+        # if a row does not have a label yet (also not in the journal), check the url
+        youtube_urls = self.target_df[(self.target_df['platform'] == 'youtube') & (self.target_df['ai_label'].isna())]
+        
+        print('starting to check urls for AI labels')
+        
+        invalid_urls = set(self.invalid_urls)
+        urls_to_check = [url for url in youtube_urls['url'] if url not in invalid_urls]
+        print (f"Found {len(urls_to_check)} URLs to check for AI labels with {self.num_workers} workers.")
+
+        if self.detection == "http":
+            urls_to_check = await self.check_urls_http(urls_to_check)
+        if not urls_to_check:
+            self.compact()
+            return
+
+        own_pool = pool is None
+        if own_pool:
+            pool = await BrowserPool(headless=self.headless, warm_contexts=0).start()  # Use firefox 
+        try:
+            async with pool.context(storage_state=self.cookies) as context: # use cookies 
+                await self.check_urls(context, urls_to_check)
+        finally:
+            # Close the browser, unless it belongs to a shared pool
+            if own_pool:
+                await pool.close()
+
+        print(self.blocker.summary())
+
+        # Write the results back into the CSV once
+        self.compact()
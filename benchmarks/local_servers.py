@@ -0,0 +1,266 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+KINDS = "PDH"  # Plain, disclosure (+ how this was made), how this was made only, as in fixtures/feed.html
+
+DISCLOSURE_HTML = '<div class="ytwPlayerDisclosureViewModelText">Altered or synthetic content</div>'
+HOW_THIS_WAS_MADE_HTML = '<div class="ytwHowThisWasMadeSectionViewModelHost">How this was made</div>'
+
+
+def youtube_video_id(i):
+    """Video ID of the i-th fixture Short, the first letter tells which labels its page shows."""
+    return f"{KINDS[i % len(KINDS)]}{i:010d}"
+
+
+def tiktok_video_id(i):
+    return f"7{i:018d}"
+
+
+def expected_label(video_id):
+    """Returns the (ai_label, sensitive_topic) the label check should find on the fixture page of the video."""
+    return {"P": (0, 0), "D": (1, 1), "H": (1, 0)}[video_id[0]]
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def initial_data(video_id):
+    """The ytInitialData of a fixture Short, with the same labels as its rendered page."""
+    kind = video_id[0] if video_id and video_id[0] in KINDS else "P"
+    items = [{"expandableVideoDescriptionBodyRenderer": {"descriptionBodyText": {"content": f"Fixture Short {video_id}"}}}]
+    if kind in "DH":
+        items.append({"howThisWasMadeSectionViewModel": {"sectionTitle": {"content": "How this was made"}}})
+    overlay = {"reelPlayerOverlayRenderer": {"metapanel": {"reelMetapanelViewModel": {"videoId": video_id}}}}
+    if kind == "D":
+        overlay["reelPlayerOverlayRenderer"]["disclosure"] = {
+            "playerDisclosureViewModel": {"disclosureText": {"content": "Altered or synthetic content"}}}
+    return {
+        "overlay": overlay,
+        "engagementPanels": [{"engagementPanelSectionListRenderer": {"content": {
+            "structuredDescriptionContentRenderer": {"items": items}}}}],
+    }
+
+
+def tiktok_video_info(video_id):
+    """The fields of the TikTokApi video info that TikTokAPI.video_record reads, videos with an even number carry #ai."""
+    number = int(video_id) % 10 ** 10
+    return {
+        "id": video_id,
+        "aigcLabelType": 1 if number % 5 == 0 else 0,
+        "contents": [{"desc": "#ai #fyp" if number % 2 == 0 else "#other #fyp"}],
+        "createTime": 1714564800 + number,
+        "statsV2": {
+            "playCount": str(5000 + number * 11),
+            "diggCount": str(300 + number),
+            "commentCount": str(number % 60),
+            "shareCount": str(number % 25),
+        },
+    }
+
+
+def video_item(video_id, part):
+    """A videos.list item of the fake Data API, videos with an even number carry #ai."""
+    number = int(video_id[1:])
+    item = {"kind": "youtube#video", "etag": hashlib.md5(video_id.encode()).hexdigest(), "id": video_id}
+    if "snippet" in part:
+        item["snippet"] = {
+            "title": f"Fixture Short {number}",
+            "description": "#ai #shorts" if number % 2 == 0 else "#other #shorts",
+            "publishedAt": "2024-05-01T12:00:00Z",
+        }
+    if "statistics" in part:
+        item["statistics"] = {
+            "viewCount": str(1000 + number * 7),
+            "likeCount": str(100 + number),
+            "commentCount": str(number % 40),
+        }
+    return item
+
+
+class LocalHandler(BaseHTTPRequestHandler):
+    """
+    Serves the local stand-ins:
+    /youtube/v3/videos       fake YouTube Data API (with ETags, rate limit errors and a quota)
+    /hashtag/<tag>/shorts    infinite-scroll YouTube hashtag feed
+    /tag/<tag>               infinite-scroll TikTok hashtag feed
+    /shorts/<video_id>       Shorts page, with or without the label nodes (and initial data) depending on the video ID
+    /@<user>/video/<id>      TikTok video page with the video info as rehydration JSON
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Keep the benchmark output readable
+
+    def send_body(self, status, body, content_type="text/html; charset=utf-8", headers=None):
+        body = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        settings = self.server.settings
+        url = urllib.parse.urlparse(self.path)
+        params = urllib.parse.parse_qs(url.query)
+        parts = [part for part in url.path.split('/') if part]
+
+        if url.path == '/youtube/v3/videos':
+            self.videos_list(params)
+        elif len(parts) == 3 and parts[0] == 'hashtag' and parts[2] == 'shorts':
+            self.send_body(200, self.feed_page("/shorts/{kind}{i}"))
+        elif len(parts) == 2 and parts[0] == 'tag':
+            self.send_body(200, self.feed_page("https://www.tiktok.com/@user{n}/video/700000000{i}"))
+        elif len(parts) == 2 and parts[0] == 'shorts':
+            time.sleep(settings["page_latency"])
+            self.send_body(200, self.short_page(parts[1]))
+        elif len(parts) == 3 and parts[0].startswith('@') and parts[1] == 'video' and parts[2].isdigit():
+            time.sleep(settings["page_latency"])
+            self.send_body(200, self.tiktok_video_page(parts[2]))
+        else:
+            self.send_body(404, "Not found")
+
+    def feed_page(self, link):
+        settings = self.server.settings
+        return (load_fixture('feed.html')
+                .replace('__TOTAL__', str(settings["feed_total"]))
+                .replace('__PAGE_SIZE__', str(settings["feed_page_size"]))
+                .replace('__DELAY__', str(int(settings["feed_delay"] * 1000)))
+                .replace('__LINK__', link))
+
+    def short_page(self, video_id):
+        kind = video_id[0] if video_id and video_id[0] in KINDS else "P"
+        return (load_fixture('short.html')
+                .replace('__DISCLOSURE__', DISCLOSURE_HTML if kind == "D" else "")
+                .replace('__HOW_THIS_WAS_MADE__', HOW_THIS_WAS_MADE_HTML if kind in "DH" else "")
+                .replace('__VIDEO_ID__', video_id)
+                .replace('__INITIAL_DATA__', self.initial_data_json(video_id))
+                .replace('__DELAY__', str(int(self.server.settings["render_delay"] * 1000))))
+
+    def without_data(self, number):
+        """Every no_initial_data_every-th page has no embedded data, like an interstitial, so the fallback is used."""
+        every = self.server.settings["no_initial_data_every"]
+        return bool(every) and number % every == every - 1
+
+    def initial_data_json(self, video_id):
+        if video_id[1:].isdigit() and self.without_data(int(video_id[1:])):
+            return "undefined"
+        return json.dumps(initial_data(video_id))
+
+    def tiktok_video_page(self, video_id):
+        scope = {}
+        if not self.without_data(int(video_id) % 10 ** 10):
+            scope["webapp.video-detail"] = {"statusCode": 0, "itemInfo": {"itemStruct": tiktok_video_info(video_id)}}
+        return load_fixture('tiktok_video.html').replace('__REHYDRATION_DATA__', json.dumps({"__DEFAULT_SCOPE__": scope}))
+
+    def api_error(self, status, reason):
+        body = {"error": {"code": status, "message": reason, "errors": [{"reason": reason}]}}
+        self.send_body(status, json.dumps(body), "application/json")
+
+    def videos_list(self, params):
+        settings = self.server.settings
+        time.sleep(settings["api_latency"])
+        with self.server.lock:
+            self.server.api_calls += 1
+            calls = self.server.api_calls
+        if settings["quota_calls"] is not None and calls > settings["quota_calls"]:
+            return self.api_error(403, "quotaExceeded")
+        if random.random() < settings["rate_limit_rate"]:
+            return self.api_error(429, "rateLimitExceeded")
+
+        part = params.get("part", [""])[0]
+        video_ids = [video_id for video_id in params.get("id", [""])[0].split(",") if video_id]
+        items = [video_item(video_id, part) for video_id in video_ids if video_id[:1] in KINDS]
+        etag = hashlib.md5(json.dumps(items, sort_keys=True).encode()).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            return self.send_body(304, b"", headers={"ETag": etag})
+        self.send_body(200, json.dumps({"kind": "youtube#videoListResponse", "etag": etag, "items": items}),
+                       "application/json", {"ETag": etag})
+
+
+class LocalServer:
+    """Runs the LocalHandler on a free port of 127.0.0.1 in a background thread."""
+    def __init__(self, feed_total=300, feed_page_size=24, feed_delay=0.2, render_delay=0.3, page_latency=0.0,
+                 api_latency=0.05, rate_limit_rate=0.0, quota_calls=None, no_initial_data_every=10):
+        self.settings = {
+            "feed_total": feed_total,
+            "feed_page_size": feed_page_size,
+            "feed_delay": feed_delay,
+            "render_delay": render_delay,
+            "page_latency": page_latency,
+            "api_latency": api_latency,
+            "rate_limit_rate": rate_limit_rate,
+            "quota_calls": quota_calls,
+            "no_initial_data_every": no_initial_data_every,
+        }
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), LocalHandler)
+        self.server.daemon_threads = True
+        self.server.settings = self.settings
+        self.server.lock = threading.Lock()
+        self.server.api_calls = 0
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LocalTikTokVideo:
+    def __init__(self, api, url):
+        self.api = api
+        self.url = url
+
+    async def info(self, session_index=0):
+        """Returns the fields of the TikTokApi video info that TikTokAPI.video_record reads."""
+        await asyncio.sleep(self.api.latency * random.uniform(0.5, 1.5))
+        if random.random() < self.api.failure_rate:
+            raise TimeoutError("Simulated TikTok session timeout")
+        return tiktok_video_info(self.url.rstrip('/').split('/')[-1])
+
+
+class LocalTikTokApi:
+    """Stand-in for TikTokApi with the session list and the video(url=...).info(session_index=...) calls."""
+    def __init__(self, num_sessions=1, latency=0.2, failure_rate=0.0):
+        self.sessions = [object() for _ in range(num_sessions)]
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    def video(self, url):
+        return LocalTikTokVideo(self, url)
+
+    async def close_sessions(self):
+        pass
+
+    async def stop_playwright(self):
+        pass
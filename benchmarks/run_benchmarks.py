@@ -0,0 +1,294 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Make the repo modules importable
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+import TikTok.tiktok_api as tiktok_API
+import YouTube.youtube_api as youtube_API
+from local_servers import LocalServer, LocalTikTokApi, expected_label, tiktok_video_id, youtube_video_id
+
+STAGES = ["youtube_api", "youtube_api_sync", "youtube_statistics", "tiktok_info", "tiktok_info_http", "youtube_feed",
+          "tiktok_feed", "label_check", "label_check_http"]
+SEARCH_HASHTAGS = ["#ai"]
+
+
+class StageResult:
+    """Throughput, per-URL latency and peak Python memory of one benchmark stage."""
+    def __init__(self, name, urls, seconds, latencies, peak_bytes, extra=None):
+        self.name = name
+        self.urls = urls
+        self.seconds = seconds
+        self.latencies = sorted(latencies)
+        self.peak_bytes = peak_bytes
+        self.extra = extra or {}
+
+    def percentile(self, q):
+        if not self.latencies:
+            return float('nan')
+        return self.latencies[min(int(q / 100 * len(self.latencies)), len(self.latencies) - 1)]
+
+    def as_dict(self):
+        return {
+            "stage": self.name,
+            "urls": self.urls,
+            "seconds": round(self.seconds, 3),
+            "urls_per_second": round(self.urls / self.seconds, 2) if self.seconds else None,
+            "latency_p50_ms": round(self.percentile(50) * 1000, 1),
+            "latency_p90_ms": round(self.percentile(90) * 1000, 1),
+            "latency_p99_ms": round(self.percentile(99) * 1000, 1),
+            "peak_memory_mb": round(self.peak_bytes / 2 ** 20, 2),
+            **self.extra,
+        }
+
+
+def time_calls(obj, name, latencies, count):
+    """Replaces obj.name by a wrapper that adds the duration of every call once per URL it handled."""
+    func = getattr(obj, name)
+    if asyncio.iscoroutinefunction(func):
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                latencies.extend([time.perf_counter() - start] * count(*args))
+    else:
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                latencies.extend([time.perf_counter() - start] * count(*args))
+    setattr(obj, name, wrapper)
+
+
+async def measure(name, stage):
+    """Runs the stage coroutine function, which returns (number of URLs, latencies, extra info)."""
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        urls, latencies, extra = await stage()
+        seconds = time.perf_counter() - start
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return StageResult(name, urls, seconds, latencies, peak_bytes, extra)
+
+
+class LocalTikTokAPI(tiktok_API.TikTokAPI):
+    """TikTokAPI whose sessions are LocalTikTokApi stand-ins instead of TikTokApi browser sessions."""
+    def __init__(self, latency, failure_rate, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    async def start_sessions(self):
+        self.api = LocalTikTokApi(self.num_sessions, self.latency, self.failure_rate)
+        self.healthy_sessions = set(range(len(self.api.sessions)))
+        self.session_failures = {session_index: 0 for session_index in self.healthy_sessions}
+
+
+async def stream_latencies(stream):
+    """Consumes a URL stream and returns the URLs and the time each URL took since the previous one."""
+    urls, latencies = [], []
+    last = time.perf_counter()
+    async for url in stream:
+        now = time.perf_counter()
+        urls.append(url)
+        latencies.append(now - last)
+        last = now
+    return urls, latencies
+
+
+def build_stages(args, server):
+    youtube_urls = [f"https://www.youtube.com/shorts/{youtube_video_id(i)}" for i in range(args.videos)]
+    tiktok_urls = [f"https://www.tiktok.com/@user{i % 50}/video/{tiktok_video_id(i)}" for i in range(args.videos)]
+    api_url = f"{server.url}/youtube/v3"
+
+    async def youtube_api():
+        api = youtube_API.YouTubeAPI("benchmark-key", base_url=api_url)
+        latencies = []
+        time_calls(api.client, "list_videos_async", latencies, lambda client, video_ids, *rest: len(video_ids))
+        df = await api.fetch_video_details_async(youtube_urls, SEARCH_HASHTAGS, max_concurrency=args.concurrency)
+        return len(youtube_urls), latencies, {"matched": len(df), "api_requests": api.client.request_count}
+
+    async def youtube_api_sync():
+        api = youtube_API.YouTubeAPI("benchmark-key", base_url=api_url)
+        latencies = []
+        time_calls(api.client, "list_videos", latencies, lambda video_ids, *rest: len(video_ids))
+        df = await asyncio.to_thread(api.fetch_video_details, youtube_urls, SEARCH_HASHTAGS)
+        return len(youtube_urls), latencies, {"matched": len(df), "api_requests": api.client.request_count}
+
+    async def youtube_statistics():
+        # The second poll of the same batches is answered with 304 Not Modified
+        api = youtube_API.YouTubeAPI("benchmark-key", base_url=api_url)
+        latencies = []
+        video_ids = [youtube_video_id(i) for i in range(args.videos)]
+        await api.fetch_statistics(video_ids, max_concurrency=args.concurrency)
+        time_calls(api.client, "list_videos_async", latencies, lambda client, video_ids, *rest: len(video_ids))
+        statistics = await api.fetch_statistics(video_ids, max_concurrency=args.concurrency)
+        return len(statistics), latencies, {"not_modified": api.client.not_modified}
+
+    async def run_tiktok_info(extraction):
+        api = LocalTikTokAPI(args.tiktok_latency, args.tiktok_failure_rate, ms_tokens=["benchmark"],
+                             num_sessions=args.sessions, calls_per_session=args.calls_per_session,
+                             extraction=extraction, http_concurrency=args.concurrency, site_url=server.url)
+        latencies, session_latencies = [], []
+        time_calls(api, "fetch_page_info", latencies, lambda *rest: 1)
+        await api.start_sessions()
+        original_video = api.api.video
+
+        def timed_video(url):
+            # Times the info() call of every video object the sessions create
+            video = original_video(url)
+            time_calls(video, "info", session_latencies, lambda *rest: 1)
+            return video
+        api.api.video = timed_video
+        try:
+            df = await api.fetch_video_details(tiktok_urls, SEARCH_HASHTAGS)
+        finally:
+            await api.close_sessions()
+        return len(tiktok_urls), latencies + session_latencies, {"matched": len(df),
+                                                                 "session_calls": len(session_latencies)}
+
+    async def tiktok_info():
+        return await run_tiktok_info("sessions")
+
+    async def tiktok_info_http():
+        return await run_tiktok_info("http")
+
+    async def youtube_feed():
+        scraper = youtube_API.YouTubeScraper(target_urls=args.videos, search_query="#ai", headless=True,
+                                             site_url=server.url)
+        urls, latencies = await stream_latencies(scraper.stream_urls())
+        return len(urls), latencies, {"scrolls": scraper.scroll_attempts}
+
+    async def tiktok_feed():
+        scraper = tiktok_API.TikTokScraper(target_urls=args.videos, search_query="#ai", headless=True,
+                                           site_url=server.url)
+        urls, latencies = await stream_latencies(scraper.stream_urls())
+        return len(urls), latencies, {"scrolls": scraper.scroll_attempts}
+
+    async def run_label_check(detection):
+        with tempfile.TemporaryDirectory() as folder:
+            video_ids = [youtube_video_id(i) for i in range(args.label_videos)]
+            init_df_path = os.path.join(folder, 'labels.csv')
+            pd.DataFrame({
+                "url": [f"{server.url}/shorts/{video_id}" for video_id in video_ids],
+                "platform": "youtube",
+                "ai_label": None,
+                "sensitive_topic": None,
+            }).to_csv(init_df_path, index=False)
+            cookies = os.path.join(folder, 'cookies.json')
+            with open(cookies, 'w') as f:
+                json.dump({"cookies": [], "origins": []}, f)
+            invalid_path = os.path.join(folder, 'invalid.json')  # The checker reads the invalid URLs of earlier runs
+            with open(invalid_path, 'w') as f:
+                json.dump([], f)
+
+            checker = youtube_API.LabelCheckerYouTube(init_df_path, cookies, invalid_path,
+                                                      headless=True, num_workers=args.workers, detection=detection)
+            latencies, browser_latencies = [], []
+            time_calls(checker, "check_url_http", latencies, lambda *rest: 1)
+            time_calls(checker, "check_url", browser_latencies, lambda *rest: 1)
+            await checker.scrape_labels()
+            checker.journal.close()
+
+            results = pd.read_csv(init_df_path)
+            correct = sum(
+                (row.ai_label, row.sensitive_topic) == expected_label(row.url.rsplit('/', 1)[-1])
+                for row in results.itertuples())
+            return len(video_ids), latencies + browser_latencies, {"correct": int(correct),
+                                                                   "browser_pages": len(browser_latencies)}
+
+    async def label_check():
+        return await run_label_check("browser")
+
+    async def label_check_http():
+        return await run_label_check("http")
+
+    return {
+        "youtube_api": youtube_api,
+        "youtube_api_sync": youtube_api_sync,
+        "youtube_statistics": youtube_statistics,
+        "tiktok_info": tiktok_info,
+        "tiktok_info_http": tiktok_info_http,
+        "youtube_feed": youtube_feed,
+        "tiktok_feed": tiktok_feed,
+        "label_check": label_check,
+        "label_check_http": label_check_http,
+    }
+
+
+def print_report(results):
+    columns = ["stage", "urls", "seconds", "urls_per_second", "latency_p50_ms", "latency_p90_ms", "latency_p99_ms",
+               "peak_memory_mb"]
+    rows = [result.as_dict() for result in results]
+    print()
+    print(pd.DataFrame(rows, columns=columns).to_string(index=False))
+    for row in rows:
+        extra = {key: value for key, value in row.items() if key not in columns}
+        if extra:
+            print(f"{row['stage']}: {extra}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks against local stand-ins of YouTube and TikTok.")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES[:5],
+                        help="stages to run, the feed and label stages need the Playwright browsers")
+    parser.add_argument("--videos", type=int, default=500, help="number of videos per API and feed stage")
+    parser.add_argument("--label-videos", type=int, default=30, help="number of Shorts pages for the label check")
+    parser.add_argument("--no-initial-data-every", type=int, default=10,
+                        help="every n-th Shorts or TikTok page has no embedded data, so the HTTP path falls back")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent YouTube API requests")
+    parser.add_argument("--sessions", type=int, default=2, help="TikTok stand-in sessions")
+    parser.add_argument("--calls-per-session", type=int, default=2, help="video info calls in flight per session")
+    parser.add_argument("--workers", type=int, default=4, help="label check pages")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="seconds per fake Data API response")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of Data API calls answered with 429")
+    parser.add_argument("--tiktok-latency", type=float, default=0.05, help="mean seconds per TikTok video info call")
+    parser.add_argument("--tiktok-failure-rate", type=float, default=0.0, help="share of failing TikTok calls")
+    parser.add_argument("--feed-delay", type=float, default=0.2, help="seconds before the next feed page appears")
+    parser.add_argument("--render-delay", type=float, default=0.3, help="seconds before a Shorts metapanel appears")
+    parser.add_argument("--json", help="also write the results as JSON lines to this file")
+    parser.add_argument("--smoke", action="store_true",
+                        help="exit with code 1 when a stage crashes or the label check gets a label wrong")
+    args = parser.parse_args()
+
+    server = LocalServer(feed_total=args.videos, feed_delay=args.feed_delay, render_delay=args.render_delay,
+                         api_latency=args.api_latency, rate_limit_rate=args.rate_limit_rate,
+                         no_initial_data_every=args.no_initial_data_every).start()
+    try:
+        stages = build_stages(args, server)
+        results = []
+        failures = []
+        for name in args.stages:
+            print(f"Running {name}...")
+            try:
+                results.append(await measure(name, stages[name]))
+            except Exception as e:
+                if not args.smoke:
+                    raise
+                failures.append(f"{name} crashed: {e!r}")
+    finally:
+        server.close()
+
+    print_report(results)
+    if args.smoke:
+        failures += [f"{result.name}: {result.extra['correct']} of {result.urls} labels correct"
+                     for result in results if result.extra.get("correct", result.urls) < result.urls]
+        print("\n".join(failures) or "Smoke run passed.")
+        if failures:
+            sys.exit(1)
+    if args.json:
+        with open(args.json, 'a') as f:
+            for result in results:
+                f.write(json.dumps({"time": time.time(), "args": vars(args), **result.as_dict()}) + "\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,140 @@
+import TikTok.tiktok_api as tiktok_API
+import YouTube.youtube_api as youtube_API
+from utils.video_cache import VideoCache
+from utils.quota import QuotaLedger
+from utils.hashtag_registry import register_hashtags
+from utils.dataset_store import DatasetStore
+from utils.url_registry import UrlRegistry, new_run_id
+from utils.browser_pool import BrowserPool
+from utils.session_state import state_path
+from utils.checkpoint import UrlCheckpoint, checkpoint_path
+from utils.metrics import metrics
+import asyncio
+import itertools
+import json
+import os
+
+PLATFORMS = ['youtube', 'tiktok']  # Platforms to scrape
+HASHTAGS = ["#ai"]  # Hashtags to scrape
+COUNTRIES = ["NL"]  # Countries to scrape, see PROXIES
+TOTAL_VIDEOS_NEEDED = 250  # Number of videos to gather per job
+CONCURRENCY = {'youtube': 2, 'tiktok': 1}  # Number of jobs per platform that run at the same time
+RESUME = True  # Jobs that were interrupted continue from their checkpoint, finished jobs start from zero
+HEADLESS = False  # Run once with False to accept the consent and solve the captchas, the saved state is reused headless
+
+# Playwright proxy settings per country, e.g. {"US": {"server": "http://us.proxy:8080"}}.
+# Without a proxy the job uses the location of the active VPN, so only list the country of the VPN then.
+PROXIES = {}
+
+# Optionally check the YouTube AI labels afterwards in the same (already warm) browser
+LABEL_CHECK = False
+LABEL_CHECK_CSV = 'data/merged_datasets_platforms/merged_dataset_with_youtube_labels.csv'
+COOKIES_JSON = 'YouTube/youtube_cookies.json'
+INVALID_PATH = 'data/youtube_invalid_urls.json'
+
+HASHTAG_JSON = 'data/hashtag_set.json'
+CACHE_PATH = 'data/video_cache.sqlite'
+QUOTA_LEDGER = 'data/youtube_quota.json'  # Quota use of the API key and the video IDs left when it ran out
+STORE_PATH = 'data/store'
+REGISTRY_PATH = 'data/url_registry.sqlite'
+API_KEY_YOUTUBE = "..."  # Fill in the API-key
+
+
+def target_paths(platform, hashtag, country):
+    """Returns the same folder, CSV and JSON paths as the platform hashtag_search.py scripts."""
+    target_folder = f'data/{platform}/{hashtag}'
+    return target_folder, f'{target_folder}/{hashtag}_{country}.csv', f'{target_folder}/{hashtag}_{country}.json'
+
+
+async def run_job(pool, platform, hashtag, country, semaphore, hashtag_set, youtube_api, tiktok_api, registry, run_id):
+    """Scrapes one (platform, hashtag, country) combination in a context of the pool and saves the results."""
+    async with semaphore:
+        print(f"Starting job {platform} {hashtag} {country}")
+        target_folder, target_csv, target_json = target_paths(platform, hashtag, country)
+        os.makedirs(target_folder, exist_ok=True)
+
+        # Every harvested URL is flushed to the checkpoint, a crashed job continues from it in the next campaign
+        checkpoint = UrlCheckpoint(checkpoint_path(platform, hashtag, country), resume=RESUME)
+        if platform == 'youtube':
+            scraper = youtube_API.YouTubeScraper(target_urls=TOTAL_VIDEOS_NEEDED, search_query=hashtag,
+                                                 headless=HEADLESS, proxy=PROXIES.get(country),
+                                                 state_path=state_path(platform, country), checkpoint=checkpoint)
+        else:
+            scraper = tiktok_API.TikTokScraper(target_urls=TOTAL_VIDEOS_NEEDED, search_query=hashtag,
+                                               headless=HEADLESS, proxy=PROXIES.get(country),
+                                               state_path=state_path(platform, country), checkpoint=checkpoint)
+
+        try:
+            urls = await scraper.scrape_urls(pool=pool)
+        finally:
+            checkpoint.close()
+
+        # Export the URLs as JSON
+        with open(target_json, 'w') as f:
+            json.dump(urls, f)
+        checkpoint.complete()
+
+        registry.register(urls, hashtag, country, run_id)
+
+        # Gather information about the URLs
+        if platform == 'youtube':
+            df = await youtube_api.fetch_video_details_async(urls, search_hashtag_set=hashtag_set)
+        else:
+            df = await tiktok_api.fetch_video_details(urls, search_hashtag_set=hashtag_set)
+
+        registry.mark_enriched(df.get('url', []))
+
+        df['country'] = country
+        df['platform'] = platform
+        df.to_csv(target_csv, index=False)
+        DatasetStore(STORE_PATH).write(df, platform, hashtag, country)
+
+        print(f"Video data saved successfully! in {target_csv}")
+
+
+async def main():
+    """Runs every hashtag x country x platform combination as a job in one shared browser pool."""
+    hashtag_set = register_hashtags(HASHTAGS, path=HASHTAG_JSON)
+
+    cache = VideoCache(CACHE_PATH)
+    youtube_api = youtube_API.YouTubeAPI(API_KEY_YOUTUBE, cache=cache, ledger=QuotaLedger(QUOTA_LEDGER))
+    tiktok_api = tiktok_API.TikTokAPI(cache=cache)
+    registry = UrlRegistry(REGISTRY_PATH)
+    run_id = new_run_id()
+    semaphores = {platform: asyncio.Semaphore(CONCURRENCY.get(platform, 1)) for platform in PLATFORMS}
+
+    # The TikTok sessions are started once, when a video page could not be read, and shared by all TikTok jobs
+    if 'tiktok' in PLATFORMS:
+        await tiktok_api.start_sessions(lazy=True)
+    if 'youtube' in PLATFORMS:
+        await youtube_api.start_client()  # One pooled API client, shared by all YouTube jobs
+
+    try:
+        # Warm incognito contexts are kept ready, so the next job can start right away
+        async with BrowserPool(headless=HEADLESS, warm_contexts=sum(CONCURRENCY.values())) as pool:
+            jobs = [
+                run_job(pool, platform, hashtag, country, semaphores[platform], hashtag_set, youtube_api, tiktok_api,
+                        registry, run_id)
+                for platform, hashtag, country in itertools.product(PLATFORMS, HASHTAGS, COUNTRIES)
+            ]
+            results = await asyncio.gather(*jobs, return_exceptions=True)
+
+            if LABEL_CHECK:
+                label_checker = youtube_API.LabelCheckerYouTube(init_df_path=LABEL_CHECK_CSV, cookies=COOKIES_JSON,
+                                                                invalid_path=INVALID_PATH, headless=HEADLESS)
+                await label_checker.scrape_labels(pool=pool)
+    finally:
+        await tiktok_api.close_sessions()
+        await youtube_api.close_client()
+
+    for (platform, hashtag, country), result in zip(itertools.product(PLATFORMS, HASHTAGS, COUNTRIES), results):
+        if isinstance(result, Exception):
+            print(f"Job {platform} {hashtag} {country} failed: {result}")
+
+
+# Run everything inside an async event loop
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    finally:
+        metrics.export(script='campaign')
@@ -1,5 +1,10 @@
 import TikTok.tiktok_api as tiktok_API
-import old_codes.youtube_api as youtube_API
+import YouTube.youtube_api as youtube_API
+from utils.video_cache import VideoCache
+from utils.quota import QuotaLedger
+from utils.url_registry import UrlRegistry
+from utils.hashtags import HashtagMatcher
+from utils.metrics import metrics
 import asyncio
 import pandas as pd
 import json
@@ -9,13 +14,26 @@ INPUT_CSV = 'data/merged_datasets_platforms/merged_dataset_without_youtube_label
 TARGET_CSV_TIKTOK = 'data/tiktok/tiktok_extra_urls.csv'
 TARGET_CSV_YOUTUBE = 'data/youtube/youtube_extra_urls.csv'
 HASHTAG_JSON = f'data/hashtag_set.json'
-URL_JSONS_TIKTOK = f'data/tiktok'
-URL_JSONS_YOUTUBE = f'data/youtube'
+CACHE_PATH = 'data/video_cache.sqlite'
+QUOTA_LEDGER = 'data/youtube_quota.json'  # Quota use of the API key and the video IDs left when it ran out
+REGISTRY_PATH = 'data/url_registry.sqlite'
+URL_JSONS = 'data'  # Contains the {platform}/{hashtag}/{hashtag}_{country}.json url files
 COUNTRIES = ["NL", "US", "UK"]
 API_KEY_YOUTUBE = "..."  # Fill in the API-key
 
 with open(HASHTAG_JSON, 'r') as f:
     hashtag_set = json.load(f)
+hashtag_matcher = HashtagMatcher(hashtag_set)
+
+def refilter_cached(cache, platform, platform_api, urls):
+    """
+    Returns the cached videos of the urls that match the hashtag set, and the urls that are not cached.
+    The counters of cached videos may be older than the cache TTL, the hashtags never change.
+    """
+    cached = cache.frame(platform, [platform_api.extract_video_id(url) for url in urls])
+    urls_to_fetch = [url for url in urls if platform_api.extract_video_id(url) not in cached.index]
+    return hashtag_matcher.filter_frame(cached), urls_to_fetch
+
 
 async def main():
     """Main function that searches for additional videos and fetches details."""
@@ -23,49 +41,43 @@ async def main():
     # loop trough the urls in the input_csv
     hashtag_urls = pd.read_csv(INPUT_CSV)
 
-    # save the urls to a list
-    urls_without_final_check = hashtag_urls['url'].tolist()
+    # Register the urls of all hashtag/country json files, missing files are skipped
+    registry = UrlRegistry(REGISTRY_PATH)
+    registry.import_json_outputs(hashtag_set, COUNTRIES, data_dir=URL_JSONS)
 
-    # create all tiktok and youtube links
-    all_tiktok_links = []
-    all_youtube_links = []
+    # the urls that are already in the input_csv do not have to be checked
+    registry.mark_enriched(hashtag_urls['url'])
+    print("Number of urls without final check:", len(hashtag_urls))
 
-    # loop over all the urls in the json files and check whether they are in the urls_without_final_check
-    for hashtag in hashtag_set:
-        for country in COUNTRIES:
-            with open(f'{URL_JSONS_TIKTOK}/{hashtag}/{hashtag}_{country}.json', 'r') as f:
-                urls = json.load(f)
-                all_tiktok_links.extend(urls)
+    tiktok_urls_to_check = registry.pending_enrichment('tiktok')
+    youtube_urls_to_check = registry.pending_enrichment('youtube')
 
-            with open(f'{URL_JSONS_YOUTUBE}/{hashtag}/{hashtag}_{country}.json', 'r') as f:
-                urls = json.load(f)
-                all_youtube_links.extend(urls)
+    # The per-hashtag runs already stored most of these videos in the cache
+    cache = VideoCache(CACHE_PATH)
+    tiktok_api = tiktok_API.TikTokAPI(cache=cache)
+    youtube_api = youtube_API.YouTubeAPI(API_KEY_YOUTUBE, cache=cache, ledger=QuotaLedger(QUOTA_LEDGER))
 
-    # print the number of urls
-    print("Number of urls without final check:", len(urls_without_final_check))
-    print("Number of TikTok urls in the json files:", len(all_tiktok_links))
-    print("Number of YouTube urls in the json files:", len(all_youtube_links))
+    # Cached videos are re-filtered against the (grown) hashtag set at once, only the others are fetched
+    df_tiktok_cached, tiktok_urls_to_check = refilter_cached(cache, 'tiktok', tiktok_api, tiktok_urls_to_check)
+    df_youtube_cached, youtube_urls_to_check = refilter_cached(cache, 'youtube', youtube_api, youtube_urls_to_check)
 
-    tiktok_urls_to_check = set()
-    youtube_urls_to_check = set()
+    # The videos that ran out of quota in an earlier run are fetched first
+    youtube_urls_to_check = youtube_api.pending_first(youtube_urls_to_check, key=youtube_api.extract_video_id)
 
-    for tiktok_link in all_tiktok_links:
-        if tiktok_link not in urls_without_final_check:
-            tiktok_urls_to_check.add(tiktok_link)
-
-    for youtube_link in all_youtube_links:
-        if youtube_link not in urls_without_final_check:
-            youtube_urls_to_check.add(youtube_link)
-    
     # print the number of urls to check
     print("Number of TikTok urls to check:", len(tiktok_urls_to_check))
     print("Number of YouTube urls to check:", len(youtube_urls_to_check))
 
-    tiktok_api = tiktok_API.TikTokAPI()
-    youtube_api = youtube_API.YouTubeAPI(API_KEY_YOUTUBE)
+    # Gather information about the urls, the YouTube batches run while TikTok is being enriched
+    df_tiktok_fetched, df_youtube_fetched = await asyncio.gather(
+        tiktok_api.fetch_video_details(tiktok_urls_to_check, search_hashtag_set=hashtag_matcher),
+        youtube_api.fetch_video_details_async(youtube_urls_to_check, search_hashtag_set=hashtag_matcher)
+    )
+    df_tiktok_extra_urls = pd.concat([df_tiktok_cached, df_tiktok_fetched], ignore_index=True)
+    df_youtube_extra_urls = pd.concat([df_youtube_cached, df_youtube_fetched], ignore_index=True)
 
-    # Gather information about the urls
-    df_tiktok_extra_urls = await tiktok_api.fetch_video_details(tiktok_urls_to_check, search_hashtag_set=hashtag_set)
+    registry.mark_enriched(df_tiktok_extra_urls.get('url', []))
+    registry.mark_enriched(df_youtube_extra_urls.get('url', []))
 
     df_tiktok_extra_urls['platform'] = 'tiktok'
     df_tiktok_extra_urls['country'] = 'extra'
@@ -74,8 +86,6 @@ async def main():
 
     print("Video data saved successfully! in", TARGET_CSV_TIKTOK)
 
-    df_youtube_extra_urls = youtube_api.fetch_video_details(youtube_urls_to_check, search_hashtag_set=hashtag_set)
-
     df_youtube_extra_urls['platform'] = 'youtube'
     df_youtube_extra_urls['country'] = 'extra'
 
@@ -85,4 +95,7 @@ async def main():
 
 # Run everything inside an async event loop
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    finally:
+        metrics.export(script='final_hashtag_check')
@@ -0,0 +1,37 @@
+from utils.dataset_merge import DatasetMerger, append_new_videos
+from utils.dataset_store import DatasetStore
+from utils.metrics import metrics
+import os
+import shutil
+
+DATA_DIR = 'data'  # Contains the {platform}/{platform}_extra_urls.csv files of the final hashtag check
+STORE_PATH = 'data/store'  # Typed Parquet copy of all hashtag runs, the input of the merge
+PLATFORMS = ['youtube', 'tiktok']
+OUTPUT_CSV = 'data/merged_datasets_platforms/merged_dataset_without_youtube_labels.csv'
+LABELS_CSV = 'data/merged_datasets_platforms/merged_dataset_with_youtube_labels.csv'  # Input of YouTube/label_check.py
+MANIFEST_PATH = 'data/merged_datasets_platforms/merge_manifest.json'  # The run outputs that are already merged
+INCREMENTAL = True  # Only merge new or changed run outputs into the existing dataset, False rebuilds it
+NUM_BUCKETS = 16  # Spill files the videos are spread over, more buckets lower the peak memory
+CHUNK_SIZE = 50000  # Rows per chunk that are read from a run output
+
+
+def main():
+    """Merges the outputs of all hashtag runs into one dataset with one row per video."""
+    # Runs of before the store existed are only in their CSV files
+    DatasetStore(STORE_PATH).import_csv_outputs(DATA_DIR, PLATFORMS, skip_existing=True)
+
+    # The label check writes its labels into its own copy, so only the new videos are added to it
+    labels_exist = os.path.exists(LABELS_CSV)
+    merger = DatasetMerger(OUTPUT_CSV, store_path=STORE_PATH, manifest_path=MANIFEST_PATH, num_buckets=NUM_BUCKETS,
+                           chunk_size=CHUNK_SIZE)
+    merger.merge(DATA_DIR, PLATFORMS, incremental=INCREMENTAL,
+                 on_new_rows=(lambda rows: append_new_videos(LABELS_CSV, rows)) if labels_exist else None)
+    if not labels_exist:
+        shutil.copyfile(OUTPUT_CSV, LABELS_CSV)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        metrics.export(script='merge_datasets')
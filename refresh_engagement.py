@@ -0,0 +1,78 @@
+import TikTok.tiktok_api as tiktok_API
+import YouTube.youtube_api as youtube_API
+from utils.video_cache import VideoCache
+from utils.quota import QuotaLedger
+from utils.snapshots import SnapshotStore, EtagStore
+from utils.url_registry import canonical_id
+from utils.metrics import metrics
+import asyncio
+import pandas as pd
+
+INPUT_CSV = 'data/merged_datasets_platforms/merged_dataset_with_youtube_labels.csv'
+SNAPSHOT_PATH = 'data/engagement_snapshots.sqlite'
+CACHE_PATH = 'data/video_cache.sqlite'
+QUOTA_LEDGER = 'data/youtube_quota.json'
+PLATFORMS = ['youtube', 'tiktok']
+MIN_AGE_HOURS = 20  # Videos polled more recently than this are skipped, so a daily run can be restarted
+CHUNK_SIZE = 5000  # Videos per platform that are polled before their snapshots are stored
+API_KEY_YOUTUBE = "..."  # Fill in the API-key
+
+
+def known_videos(path, platforms):
+    """Returns a dict platform -> {video_id: url} of the merged dataset, read in chunks of only the url column."""
+    videos = {platform: {} for platform in platforms}
+    for chunk in pd.read_csv(path, usecols=['url'], chunksize=100000):
+        for url in chunk['url'].dropna():
+            key = canonical_id(url)
+            if key is not None and key[0] in videos:
+                videos[key[0]][key[1]] = url
+    return videos
+
+
+async def main():
+    """Re-polls the engagement counters of all videos in the merged dataset and stores the changes as snapshots."""
+    snapshots = SnapshotStore(SNAPSHOT_PATH)
+    etags = EtagStore(SNAPSHOT_PATH)  # Unchanged batches of the last run are answered with 304 Not Modified
+    cache = VideoCache(CACHE_PATH)
+    youtube_api = youtube_API.YouTubeAPI(API_KEY_YOUTUBE, cache=cache, ledger=QuotaLedger(QUOTA_LEDGER), etags=etags)
+    tiktok_api = tiktok_API.TikTokAPI(cache=cache)
+
+    videos = known_videos(INPUT_CSV, PLATFORMS)
+
+    for platform in PLATFORMS:
+        # Sorted, so a daily run sends the same batches, the videos that ran out of quota last time go first
+        due_ids = sorted(snapshots.due(platform, videos[platform], min_age=MIN_AGE_HOURS * 3600))
+        if platform == 'youtube':
+            due_ids = youtube_api.pending_first(due_ids)
+        print(f"{len(due_ids)} of {len(videos[platform])} {platform} videos are due for a re-poll.")
+
+        if platform == 'tiktok' and due_ids:
+            await tiktok_api.start_sessions(lazy=True)  # Only started when a video page could not be read
+        if platform == 'youtube' and due_ids:
+            await youtube_api.start_client()  # One pooled API client for all chunks
+        try:
+            # Store the snapshots per chunk, so a crash only loses the chunk in flight
+            for i in range(0, len(due_ids), CHUNK_SIZE):
+                chunk = due_ids[i:i + CHUNK_SIZE]
+                if platform == 'youtube':
+                    statistics = await youtube_api.fetch_statistics(chunk)
+                else:
+                    statistics = await tiktok_api.fetch_statistics([videos[platform][video_id] for video_id in chunk])
+                changed = snapshots.record_many(platform, statistics)
+                print(f"{platform}: {changed} of {len(statistics)} videos changed since their last snapshot.")
+                if platform == 'youtube' and youtube_api.pending_ids:
+                    break  # The quota is used up, the rest is due again in the next run
+        finally:
+            await tiktok_api.close_sessions()
+            await youtube_api.close_client()
+
+    snapshots.close()
+    etags.close()
+
+
+# Run everything inside an async event loop
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    finally:
+        metrics.export(script='refresh_engagement')
@@ -0,0 +1,25 @@
+import json
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_open(path, mode='w'):
+    """
+    Opens a temporary file next to path that replaces path when the with block ends,
+    so readers never see a half written file and a crash leaves the old file intact.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def atomic_write_json(path, data, **kwargs):
+    with atomic_open(path) as f:
+        json.dump(data, f, **kwargs)
@@ -0,0 +1,80 @@
+import asyncio
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+
+
+class BrowserPool:
+    """
+    Long-lived browser that hands out pre-warmed contexts, so successive jobs skip the browser startup.
+    Incognito contexts (storage_state=None) are used once and replaced by a fresh warm one in the background.
+    Cookie-backed contexts are kept per storage_state and reused, only their pages are closed between jobs,
+    unless reuse=False: then the context only starts from the saved state and is closed after the job.
+    """
+    def __init__(self, browser_type="firefox", headless=False, warm_contexts=2):
+        self.browser_type = browser_type
+        self.headless = headless
+        self.warm_contexts = warm_contexts  # Number of incognito contexts kept ready
+        self.playwright = None
+        self.browser = None
+        self.idle = {}  # storage_state -> list of idle contexts
+        self.warming = set()
+
+    async def start(self):
+        self.playwright = await async_playwright().start()
+        self.browser = await getattr(self.playwright, self.browser_type).launch(headless=self.headless)
+        for _ in range(self.warm_contexts):
+            self.idle.setdefault(None, []).append(await self.browser.new_context(storage_state=None))
+        return self
+
+    async def close(self):
+        for task in list(self.warming):
+            task.cancel()
+        await asyncio.gather(*self.warming, return_exceptions=True)
+        if self.browser is not None:
+            await self.browser.close()
+            self.browser = None
+        if self.playwright is not None:
+            await self.playwright.stop()
+            self.playwright = None
+        self.idle = {}
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def warm_incognito_context(self):
+        context = await self.browser.new_context(storage_state=None)
+        self.idle.setdefault(None, []).append(context)
+
+    def schedule_warm_up(self):
+        task = asyncio.create_task(self.warm_incognito_context())
+        self.warming.add(task)
+        task.add_done_callback(self.warming.discard)
+
+    @asynccontextmanager
+    async def context(self, storage_state=None, proxy=None, reuse=True):
+        """Hands out a context for the given storage_state (None for incognito), proxied contexts are never pooled."""
+        if proxy is not None or (storage_state is not None and not reuse):
+            context = await self.browser.new_context(storage_state=storage_state, proxy=proxy)
+            try:
+                yield context
+            finally:
+                await context.close()
+            return
+
+        idle = self.idle.get(storage_state, [])
+        context = idle.pop() if idle else await self.browser.new_context(storage_state=storage_state)
+        try:
+            yield context
+        finally:
+            if storage_state is None:
+                # Incognito contexts are never reused, keep a fresh one ready for the next job
+                await context.close()
+                if self.browser is not None and len(self.idle.get(None, [])) + len(self.warming) < self.warm_contexts:
+                    self.schedule_warm_up()
+            else:
+                for page in context.pages:
+                    await page.close()
+                self.idle.setdefault(storage_state, []).append(context)
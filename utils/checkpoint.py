@@ -0,0 +1,61 @@
+import os
+
+CHECKPOINT_FOLDER = 'data/checkpoints'
+
+
+def checkpoint_path(platform, hashtag, country, folder=CHECKPOINT_FOLDER):
+    return os.path.join(folder, platform, f"{hashtag}_{country}.txt")
+
+
+class UrlCheckpoint:
+    """
+    Append-only file with the harvested URLs of one job, one URL per line, flushed to disk after every scroll.
+    With resume=True the URLs of an earlier, interrupted run of the job are loaded so the scraper continues
+    from them, otherwise the job starts from an empty checkpoint. A line cut off by a crash is ignored.
+    """
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.urls = self.load() if resume else []  # URLs of the earlier run
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if resume:
+            self.drop_partial_line()
+        elif os.path.exists(path):
+            print(f"Overwriting the checkpoint of an earlier run: {path}")
+        self.file = open(path, 'a' if resume else 'w')
+        if self.urls:
+            print(f"Resuming from {len(self.urls)} URLs in {path}")
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path) as f:
+            lines = f.read().split("\n")
+        # The last element is empty when the file ends with a newline, otherwise it is a cut off line
+        urls = [line for line in lines[:-1] if line]
+        return list(dict.fromkeys(urls))
+
+    def drop_partial_line(self):
+        """Removes a line that was cut off by a crash, so the next URL starts on a new line."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def append(self, urls):
+        if not urls:
+            return
+        self.file.write("".join(f"{url}\n" for url in urls))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+    def complete(self):
+        """Removes the checkpoint once the results of the job are saved, a next run starts from zero again."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
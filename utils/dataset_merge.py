@@ -0,0 +1,250 @@
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from utils.dataset_store import DatasetStore, STORE_PATH, parse_hashtags
+from utils.url_registry import VIDEO_ID_PATTERNS
+from utils.metrics import metrics
+from utils.atomic import atomic_write_json
+
+MERGED_FOLDER = 'data/merged_datasets_platforms'
+MANIFEST_NAME = 'merge_manifest.json'
+
+COUNTER_COLUMNS = ["ai_label", "sensitive_topic", "views", "likes", "comments", "shares"]
+OUTPUT_COLUMNS = ["url", "platform", "video_id", *COUNTER_COLUMNS, "publishedAt", "hashtags", "country",
+                  "search_hashtags"]
+BUCKET_COLUMNS = ["platform", "video_id", "url", *COUNTER_COLUMNS, "publishedAt", "hashtags", "country",
+                  "search_hashtags", "known"]
+SEPARATOR = ","  # Separates the countries and search hashtags of a video
+
+
+def run_outputs(store, data_dir='data', platforms=('youtube', 'tiktok')):
+    """
+    Yields (path, platform, search hashtag, country) of the Parquet files of the hashtag runs in the DatasetStore
+    and of the data/{platform}/{platform}_extra_urls.csv files of the final hashtag check, which are not in the store.
+    """
+    for path, platform, hashtag, country in sorted(store.files()):
+        if platform in platforms:
+            yield path, platform, hashtag, country
+    for platform in platforms:
+        extra_path = os.path.join(data_dir, platform, f'{platform}_extra_urls.csv')
+        if os.path.exists(extra_path):
+            yield extra_path, platform, '', 'extra'
+
+
+def compact_int(series):
+    """Coerces a column to the smallest integer dtype that holds it, a nullable one when values are missing."""
+    series = pd.to_numeric(series, errors="coerce")
+    if series.isna().any():
+        if series.isna().all():
+            return series.astype("Int8")
+        for dtype in ("Int8", "Int16", "Int32", "Int64"):
+            if series.min() >= np.iinfo(dtype.lower()).min and series.max() <= np.iinfo(dtype.lower()).max:
+                return series.astype(dtype)
+    return pd.to_numeric(series.astype("int64"), downcast="integer")
+
+
+def split_values(value):
+    if not isinstance(value, str) or not value:
+        return []
+    return value.split(SEPARATOR)
+
+
+def join_values(values):
+    return SEPARATOR.join(sorted(value for value in values if value))
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+class DatasetMerger:
+    """
+    Merges the runs in the DatasetStore into one dataset with one row per video (platform + canonical video ID).
+    The inputs are read in chunks and spread over num_buckets spill files by a hash of the video ID,
+    then every bucket is deduplicated on its own, so the peak memory is a chunk or a bucket, never all runs.
+    The hashtags, countries and search hashtags of a video are unioned, the counters keep the highest value.
+    A manifest keeps the inputs of the last merge, with incremental=True only new or changed inputs are read
+    and merged into the existing output.
+    """
+    def __init__(self, output_path, store_path=STORE_PATH, manifest_path=None, num_buckets=16, chunk_size=50000):
+        self.output_path = output_path
+        self.store = DatasetStore(store_path)
+        self.manifest_path = manifest_path or os.path.join(os.path.dirname(output_path) or '.', MANIFEST_NAME)
+        self.num_buckets = num_buckets
+        self.chunk_size = chunk_size
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {"inputs": {}}
+        with open(self.manifest_path, 'r') as f:
+            return json.load(f)
+
+    def save_manifest(self, manifest):
+        atomic_write_json(self.manifest_path, manifest, indent=2)
+
+    def normalize_run_chunk(self, chunk, platform, hashtag, country):
+        """Turns a chunk of a run output into bucket rows, rows without a video ID of the platform are dropped."""
+        urls = chunk["url"].astype(str)
+        rows = pd.DataFrame({
+            "platform": platform,
+            "video_id": urls.str.extract(VIDEO_ID_PATTERNS[platform].pattern, expand=False),
+            "url": urls,
+        })
+        for column in COUNTER_COLUMNS:
+            rows[column] = pd.to_numeric(chunk[column], errors="coerce") if column in chunk else np.nan
+        rows["publishedAt"] = chunk["publishedAt"] if "publishedAt" in chunk else None
+        if isinstance(rows["publishedAt"].dtype, pd.DatetimeTZDtype):
+            rows["publishedAt"] = rows["publishedAt"].dt.strftime("%Y-%m-%dT%H:%M:%SZ")  # Typed in the store
+        rows["hashtags"] = chunk["hashtags"].map(lambda value: json.dumps(parse_hashtags(value))) if "hashtags" in chunk else "[]"
+        rows["country"] = chunk["country"].fillna(country).astype(str) if "country" in chunk else country
+        rows["search_hashtags"] = hashtag
+        rows["known"] = 0
+        return rows.dropna(subset=["video_id"])
+
+    def normalize_merged_chunk(self, chunk):
+        """Turns a chunk of an earlier merged output back into bucket rows."""
+        rows = chunk.reindex(columns=BUCKET_COLUMNS[:-1]).copy()
+        rows["hashtags"] = rows["hashtags"].map(lambda value: json.dumps(parse_hashtags(value)))
+        rows["known"] = 1
+        return rows.dropna(subset=["video_id"])
+
+    def spill(self, rows, bucket_paths):
+        """Appends the rows to the bucket files, by a stable hash of platform and video ID."""
+        if rows.empty:
+            return
+        keys = pd.util.hash_pandas_object(rows["platform"].astype(str) + ":" + rows["video_id"].astype(str),
+                                          index=False)
+        buckets = (keys % self.num_buckets).to_numpy()
+        for bucket, group in rows.groupby(buckets):
+            path = bucket_paths[bucket]
+            group[BUCKET_COLUMNS].to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+    def merge_bucket(self, path):
+        """Deduplicates the rows of one bucket into one row per video."""
+        rows = pd.read_csv(path, dtype={"platform": "category", "video_id": str, "url": str, "country": str,
+                                        "search_hashtags": str, "publishedAt": str})
+        keys = ["platform", "video_id"]
+        grouped = rows.groupby(keys, observed=True, sort=False)
+
+        merged = grouped.agg(url=("url", "first"), publishedAt=("publishedAt", "first"), known=("known", "max"),
+                             **{column: (column, "max") for column in COUNTER_COLUMNS})
+
+        # Union of the list and set columns, each exploded to one value per row
+        hashtags = rows[keys].assign(hashtag=rows["hashtags"].map(json.loads)).explode("hashtag")
+        merged["hashtags"] = hashtags.dropna().drop_duplicates().groupby(keys, observed=True)["hashtag"].agg(list)
+        for column in ("country", "search_hashtags"):
+            values = rows[keys].assign(value=rows[column].map(split_values)).explode("value")
+            merged[column] = values.dropna().groupby(keys, observed=True)["value"].agg(lambda v: join_values(set(v)))
+
+        merged["hashtags"] = merged["hashtags"].map(lambda value: value if isinstance(value, list) else [])
+        merged = merged.reset_index()
+        return merged
+
+    def compact(self, merged):
+        """Compact dtypes: the smallest integer dtypes for the counters and categoricals for platform and country."""
+        for column in COUNTER_COLUMNS:
+            merged[column] = compact_int(merged[column])
+        merged["platform"] = merged["platform"].astype("category")
+        merged["country"] = merged["country"].fillna("").astype("category")
+        return merged
+
+    def read_chunks(self, path):
+        """Reads a run output in chunks, from the store or from a CSV file."""
+        if path.endswith('.parquet'):
+            yield from self.store.read_file(path, batch_size=self.chunk_size)
+            return
+        try:
+            yield from pd.read_csv(path, chunksize=self.chunk_size)
+        except pd.errors.EmptyDataError:
+            return  # A run without matching videos leaves an empty file
+
+    def merge(self, data_dir='data', platforms=('youtube', 'tiktok'), incremental=False, on_new_rows=None):
+        """
+        Merges the run outputs into output_path and returns the number of videos that were not in the output before.
+        On an incremental merge on_new_rows is called with the new rows of every bucket, read back from a spill
+        file once the output is replaced, so they are never all in memory. A full merge has no new rows.
+        """
+        use_existing = incremental and os.path.exists(self.output_path)
+        manifest = self.load_manifest() if use_existing else {"inputs": {}}
+        inputs = []
+        for path, platform, hashtag, country in run_outputs(self.store, data_dir, platforms):
+            signature = file_signature(path)
+            if manifest["inputs"].get(path) != signature:
+                inputs.append((path, platform, hashtag, country, signature))
+        if use_existing and not inputs:
+            print("No new run outputs to merge.")
+            return 0
+        print(f"Merging {len(inputs)} run outputs{' into the existing dataset' if use_existing else ''}.")
+
+        os.makedirs(os.path.dirname(self.output_path) or '.', exist_ok=True)
+        spill_folder = tempfile.mkdtemp(prefix='merge_', dir=os.path.dirname(self.output_path) or '.')
+        bucket_paths = [os.path.join(spill_folder, f'bucket_{i}.csv') for i in range(self.num_buckets)]
+        new_rows_path = os.path.join(spill_folder, 'new_rows.csv')
+        try:
+            if use_existing:
+                for chunk in pd.read_csv(self.output_path, chunksize=self.chunk_size, dtype={"video_id": str}):
+                    self.spill(self.normalize_merged_chunk(chunk), bucket_paths)
+            for path, platform, hashtag, country, _ in inputs:
+                for chunk in self.read_chunks(path):
+                    self.spill(self.normalize_run_chunk(chunk, platform, hashtag, country), bucket_paths)
+
+            # Every bucket is merged and appended on its own, the output replaces the old one at the end
+            tmp_output = self.output_path + '.tmp'
+            header = True
+            rows = 0
+            new_videos = 0
+            for path in bucket_paths:
+                if not os.path.exists(path):
+                    continue
+                merged = self.compact(self.merge_bucket(path))
+                merged[OUTPUT_COLUMNS].to_csv(tmp_output, mode='w' if header else 'a', header=header, index=False)
+                header = False
+                rows += len(merged)
+                if use_existing:
+                    new = merged.loc[merged["known"] == 0, OUTPUT_COLUMNS]
+                    new.to_csv(new_rows_path, mode='a', header=not os.path.exists(new_rows_path), index=False)
+                    new_videos += len(new)
+            if header:
+                pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(tmp_output, index=False)
+            os.replace(tmp_output, self.output_path)
+
+            for path, _, _, _, signature in inputs:
+                manifest["inputs"][path] = signature
+            manifest["rows"] = rows
+            self.save_manifest(manifest)
+
+            if on_new_rows is not None and os.path.exists(new_rows_path):
+                for chunk in pd.read_csv(new_rows_path, chunksize=self.chunk_size, dtype={"video_id": str}):
+                    on_new_rows(chunk)
+        finally:
+            shutil.rmtree(spill_folder, ignore_errors=True)
+
+        metrics.inc("merge_inputs_total", len(inputs))
+        metrics.set("merged_videos", rows)
+        metrics.set("merged_new_videos", new_videos)
+        print(f"Merged dataset has {rows} videos ({new_videos} new) in {self.output_path}")
+        return new_videos
+
+
+def append_new_videos(path, new_rows):
+    """Adds the new videos to a derived dataset (e.g. the one with the YouTube labels), its existing rows are kept."""
+    if new_rows.empty:
+        return
+    columns = pd.read_csv(path, nrows=0).columns
+    new_rows.reindex(columns=columns).to_csv(path, mode='a', header=False, index=False)
+    print(f"Added {len(new_rows)} new videos to {path}")
+
+
+def read_merged(path, **kwargs):
+    """Reads a merged dataset with the compact dtypes, hashtags as lists."""
+    df = pd.read_csv(path, dtype={"platform": "category", "country": "category", "video_id": str}, **kwargs)
+    for column in COUNTER_COLUMNS:
+        if column in df:
+            df[column] = compact_int(df[column])
+    if "hashtags" in df:
+        df["hashtags"] = df["hashtags"].map(parse_hashtags)
+    return df
@@ -0,0 +1,154 @@
+import ast
+import glob
+import os
+import re
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from dateutil.tz import tzlocal
+
+STORE_PATH = 'data/store'
+
+# Typed schema of the scraped datasets, hashtags are a real list column and the counters are int64
+SCHEMA = pa.schema([
+    ("url", pa.string()),
+    ("ai_label", pa.int8()),
+    ("views", pa.int64()),
+    ("likes", pa.int64()),
+    ("comments", pa.int64()),
+    ("shares", pa.int64()),
+    ("publishedAt", pa.timestamp("s", tz="UTC")),
+    ("hashtags", pa.list_(pa.string())),
+    ("platform", pa.string()),
+    ("hashtag", pa.string()),
+    ("country", pa.string()),
+])
+PARTITIONING = ds.partitioning(
+    pa.schema([("platform", pa.string()), ("hashtag", pa.string()), ("country", pa.string())]), flavor="hive")
+COUNTER_COLUMNS = ["ai_label", "views", "likes", "comments", "shares"]
+
+
+def parse_hashtags(value):
+    """Turns a list (or the array of a Parquet list column), a stringified Python list (as saved in the CSVs) or a text into a list of hashtags."""
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [str(tag) for tag in value]
+    if not isinstance(value, str):
+        return []
+    if value.startswith("["):
+        try:
+            return [str(tag) for tag in ast.literal_eval(value)]
+        except (ValueError, SyntaxError):
+            pass
+    return re.findall(r"#\w+", value)
+
+
+def to_utc(values):
+    """
+    Parses the publishedAt values as UTC timestamps. The YouTube API gives ISO times with a Z, TikTok records
+    have the local time of the machine that scraped them (as in their CSV files), these are converted from it.
+    """
+    parsed = pd.to_datetime(values, errors="coerce", format="ISO8601")
+    if parsed.dt.tz is None:
+        parsed = parsed.dt.tz_localize(tzlocal(), ambiguous="NaT", nonexistent="NaT")
+    return parsed.dt.tz_convert("UTC")
+
+
+def to_table(df, platform, hashtag, country):
+    """Coerces a DataFrame of scraped videos to the typed schema, missing columns are null."""
+    if df.empty:
+        return SCHEMA.empty_table()  # e.g. a run without matching videos, its DataFrame has no columns
+    df = df.copy()
+    for column in COUNTER_COLUMNS:
+        if column in df:
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("Int64")
+        else:
+            df[column] = pd.array([pd.NA] * len(df), dtype="Int64")
+    df["publishedAt"] = to_utc(df["publishedAt"]) if "publishedAt" in df else pd.NaT
+    df["hashtags"] = df["hashtags"].map(parse_hashtags) if "hashtags" in df else [[] for _ in range(len(df))]
+    df["platform"] = platform
+    df["hashtag"] = hashtag
+    df["country"] = country
+    return pa.Table.from_pandas(df.reindex(columns=SCHEMA.names), schema=SCHEMA, preserve_index=False)
+
+
+class DatasetStore:
+    """
+    Columnar store of the scraped datasets, partitioned as platform=/hashtag=/country= Parquet files.
+    Writing a (platform, hashtag, country) job replaces that partition, reads support column and filter pushdown.
+    """
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+
+    def write(self, df, platform, hashtag, country):
+        """Writes the results of one job, replacing an earlier run of the same job, also when there are no rows."""
+        table = to_table(df, platform, hashtag, country)
+        self.delete_partition(platform, hashtag, country)
+        if table.num_rows:
+            ds.write_dataset(table, self.path, format="parquet", partitioning=PARTITIONING,
+                             existing_data_behavior="delete_matching", basename_template="part-{i}.parquet")
+
+    def delete_partition(self, platform, hashtag, country):
+        for path, *keys in list(self.files()):
+            if tuple(keys) == (platform, hashtag, country):
+                shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    def dataset(self):
+        return ds.dataset(self.path, format="parquet", partitioning=PARTITIONING, schema=SCHEMA)
+
+    def files(self):
+        """Yields (path, platform, hashtag, country) of every Parquet file in the store."""
+        if not os.path.exists(self.path):
+            return
+        for fragment in self.dataset().get_fragments():
+            keys = ds.get_partition_keys(fragment.partition_expression)
+            yield fragment.path, keys["platform"], keys["hashtag"], keys["country"]
+
+    def read_file(self, path, batch_size=50000):
+        """Reads one Parquet file of the store in DataFrames of batch_size rows, without the partition columns."""
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield batch.to_pandas()
+
+    def read(self, columns=None, **filters):
+        """
+        Reads the store as a DataFrame, only loading the requested columns and matching partitions/rows.
+        Filters are column=value or column=[values], e.g. read(["url", "views"], platform="youtube", country=["NL", "US"]).
+        """
+        expression = None
+        for column, value in filters.items():
+            if isinstance(value, (list, tuple, set)):
+                condition = pc.field(column).isin(list(value))
+            else:
+                condition = pc.field(column) == value
+            expression = condition if expression is None else expression & condition
+        if not os.path.exists(self.path):
+            return pd.DataFrame(columns=columns or SCHEMA.names)
+        return self.dataset().to_table(columns=columns, filter=expression).to_pandas()
+
+    def import_csv_outputs(self, data_dir='data', platforms=('youtube', 'tiktok'), skip_existing=False):
+        """
+        Imports the data/{platform}/{hashtag}/{hashtag}_{country}.csv files of earlier runs.
+        With skip_existing=True only the runs that have no partition in the store yet are imported.
+        """
+        existing = {(platform, hashtag, country) for _, platform, hashtag, country in self.files()} if skip_existing else set()
+        imported = 0
+        for platform in platforms:
+            for csv_path in glob.glob(os.path.join(data_dir, platform, '*', '*.csv')):
+                hashtag = os.path.basename(os.path.dirname(csv_path))
+                name = os.path.splitext(os.path.basename(csv_path))[0]
+                if not name.startswith(hashtag + '_'):
+                    continue  # Not a per-run output, e.g. the extra URL files
+                country = name[len(hashtag) + 1:]
+                if (platform, hashtag, country) in existing:
+                    continue
+                try:
+                    df = pd.read_csv(csv_path)
+                except pd.errors.EmptyDataError:
+                    continue
+                self.write(df, platform, hashtag, country)
+                imported += 1
+        print(f"Imported {imported} CSV files into {self.path}")
+        return imported
@@ -0,0 +1,76 @@
+# Installs a MutationObserver that remembers the href of every matching anchor once,
+# including the anchors that are already on the page. New hrefs wait in a pending list until drained.
+INSTALL_HARVESTER_JS = """
+(selector) => {
+    if (window.__linkHarvester) return;
+    const harvester = {seen: new Set(), pending: []};
+    const collect = (node) => {
+        if (node.nodeType !== Node.ELEMENT_NODE) return;
+        const anchors = node.matches(selector) ? [node] : [];
+        anchors.push(...node.querySelectorAll(selector));
+        for (const anchor of anchors) {
+            const href = anchor.getAttribute('href');
+            if (href && !harvester.seen.has(href)) {
+                harvester.seen.add(href);
+                harvester.pending.push(href);
+            }
+        }
+    };
+    collect(document.documentElement);
+    harvester.observer = new MutationObserver((mutations) => {
+        for (const mutation of mutations) {
+            if (mutation.type === 'attributes') collect(mutation.target);
+            else mutation.addedNodes.forEach(collect);
+        }
+    });
+    harvester.observer.observe(document.documentElement,
+        {childList: true, subtree: true, attributes: true, attributeFilter: ['href']});
+    window.__linkHarvester = harvester;
+}
+"""
+
+# Returns the pending hrefs and empties the list, null when the harvester is gone (e.g. after a navigation)
+DRAIN_HARVESTER_JS = """
+() => {
+    const harvester = window.__linkHarvester;
+    if (!harvester) return null;
+    const pending = harvester.pending;
+    harvester.pending = [];
+    return pending;
+}
+"""
+
+
+class LinkHarvester:
+    """Collects the hrefs of newly added anchors inside the page and hands them over in one call per drain."""
+    def __init__(self, page, selector):
+        self.page = page
+        self.selector = selector
+
+    async def install(self):
+        await self.page.evaluate(INSTALL_HARVESTER_JS, self.selector)
+
+    async def drain(self):
+        """Returns the hrefs that were added since the last drain."""
+        hrefs = await self.page.evaluate(DRAIN_HARVESTER_JS)
+        if hrefs is None:
+            # The page navigated and lost the observer, install it again (this also collects the current anchors)
+            await self.install()
+            hrefs = await self.page.evaluate(DRAIN_HARVESTER_JS)
+        return hrefs
+
+    async def collect(self, format_url, seen, checkpoint=None):
+        """
+        Drains the hrefs and returns them with the URLs (made by format_url) that are not in seen yet.
+        The new URLs are added to seen and flushed to the checkpoint before they are handed over.
+        """
+        hrefs = await self.drain()
+        new_urls = []
+        for href in hrefs:
+            url = format_url(href)
+            if url and url not in seen:
+                seen.add(url)
+                new_urls.append(url)
+        if checkpoint is not None:
+            checkpoint.append(new_urls)
+        return hrefs, new_urls
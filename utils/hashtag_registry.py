@@ -0,0 +1,51 @@
+import json
+import os
+import time
+from utils.atomic import atomic_write_json
+
+HASHTAG_JSON = 'data/hashtag_set.json'
+
+
+class RegistryLock:
+    """Simple cross-platform lock file, so parallel runs do not overwrite each other's hashtags."""
+    def __init__(self, path, timeout=30, stale_after=120):
+        self.lock_path = path + '.lock'
+        self.timeout = timeout
+        self.stale_after = stale_after  # A lock older than this is left over from a crashed run
+
+    def __enter__(self):
+        deadline = time.time() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.lock_path) > self.stale_after:
+                        os.remove(self.lock_path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.time() > deadline:
+                    raise TimeoutError(f"Could not lock {self.lock_path} within {self.timeout} seconds")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        os.remove(self.lock_path)
+
+
+def load_hashtags(path=HASHTAG_JSON):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def register_hashtags(hashtags, path=HASHTAG_JSON):
+    """Adds the hashtags to the registry atomically and returns the full hashtag set."""
+    with RegistryLock(path):
+        hashtag_set = load_hashtags(path) if os.path.exists(path) else []
+        new_hashtags = [hashtag for hashtag in hashtags if hashtag not in hashtag_set]
+        if new_hashtags:
+            hashtag_set.extend(new_hashtags)
+            atomic_write_json(path, hashtag_set, indent=4)
+    return hashtag_set
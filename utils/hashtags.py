@@ -0,0 +1,51 @@
+import re
+
+HASHTAG_PATTERN = re.compile(r"#\w+")
+
+
+def extract_hashtags(text):
+    """Extracts the hashtags from a text (title/description/contents)."""
+    return HASHTAG_PATTERN.findall(text) if text else []
+
+
+class HashtagMatcher:
+    """
+    Case-insensitive matcher for a set of search hashtags, compiled once into a frozenset.
+    A video matches when one of its hashtags is in the set, which is one hash lookup per hashtag.
+    matches works on the hashtag list of a single record, filter_frame re-filters a whole DataFrame at once.
+    """
+    def __init__(self, search_hashtags):
+        self.hashtags = frozenset(hashtag.lower() for hashtag in search_hashtags)
+
+    def __len__(self):
+        return len(self.hashtags)
+
+    def matches(self, hashtags):
+        """Returns True if one of the hashtags (a list of hashtags) is a search hashtag."""
+        return any(hashtag.lower() in self.hashtags for hashtag in hashtags)
+
+    def matches_text(self, text):
+        return self.matches(extract_hashtags(text))
+
+    def mask(self, column):
+        """
+        Vectorized version of matches for a Series of hashtag lists, stringified lists (as saved in the CSVs)
+        or plain texts. Returns a boolean array aligned with the column.
+        """
+        column = column.reset_index(drop=True)
+        tags = column.astype(str).str.lower().str.findall(HASHTAG_PATTERN).explode()
+        found = tags.isin(self.hashtags).groupby(level=0).any()
+        return found.reindex(column.index, fill_value=False).to_numpy(dtype=bool)
+
+    def filter_frame(self, df, column="hashtags"):
+        """Returns the rows of df of which the column contains one of the search hashtags."""
+        if df.empty or column not in df:
+            return df.iloc[0:0]
+        return df[self.mask(df[column])]
+
+
+def compile_hashtags(search_hashtag_set):
+    """Accepts a HashtagMatcher or any collection of hashtags and returns a HashtagMatcher."""
+    if isinstance(search_hashtag_set, HashtagMatcher):
+        return search_hashtag_set
+    return HashtagMatcher(search_hashtag_set)
@@ -0,0 +1,170 @@
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from utils.atomic import atomic_open
+
+METRICS_JSONL = 'data/metrics.jsonl'
+METRICS_PROM = 'data/metrics.prom'
+
+# Upper bounds of the histogram buckets, in seconds for latencies and in URLs for the scroll yield
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+    def quantile(self, q):
+        """Estimates a quantile as the upper bound of the bucket it falls in (the maximum for the last bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.bucket_counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Metrics:
+    """
+    In-process counters, gauges and histograms, identified by a name and labels (e.g. platform="youtube").
+    The scrapers, API clients and the label checker record into the shared `metrics` registry below,
+    the scripts export it at the end of a run as JSON lines (to compare runs) and in the Prometheus text format.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()  # The sync YouTube fetch may run in a worker thread
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.started_at = time.time()
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self.key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges[self.key(name, labels)] = value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = self.key(name, labels)
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(buckets)
+            self.histograms[key].observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observes the duration of the with block in seconds, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self):
+        with self.lock:
+            self.counters, self.gauges, self.histograms = {}, {}, {}
+            self.started_at = time.time()
+
+    def records(self):
+        """Returns one dict per metric series."""
+        with self.lock:
+            records = [{"type": "counter", "name": name, "labels": dict(labels), "value": value}
+                       for (name, labels), value in self.counters.items()]
+            records += [{"type": "gauge", "name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in self.gauges.items()]
+            records += [{"type": "histogram", "name": name, "labels": dict(labels), **histogram.as_dict()}
+                        for (name, labels), histogram in self.histograms.items()]
+        return records
+
+    def write_jsonl(self, path=METRICS_JSONL, **run_labels):
+        """Appends the metrics of this run as JSON lines, run_labels (e.g. script, hashtag) are added to every line."""
+        finished_at = time.time()
+        with open(path, 'a') as f:
+            for record in self.records():
+                f.write(json.dumps({"started_at": self.started_at, "finished_at": finished_at,
+                                    "run": run_labels, **record}) + "\n")
+
+    def to_prometheus(self):
+        lines = []
+        typed = set()
+
+        def label_text(labels, **extra):
+            labels = {**dict(labels), **extra}
+            if not labels:
+                return ""
+            return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+        def declare(name, metric_type):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {metric_type}")
+
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                declare(name, "counter")
+                lines.append(f"{name}{label_text(labels)} {value}")
+            for (name, labels), value in sorted(self.gauges.items()):
+                declare(name, "gauge")
+                lines.append(f"{name}{label_text(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                declare(name, "histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{label_text(labels, le=bound)} {cumulative}")
+                lines.append(f"{name}_bucket{label_text(labels, le='+Inf')} {histogram.count}")
+                lines.append(f"{name}_sum{label_text(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{label_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=METRICS_PROM):
+        with atomic_open(path) as f:
+            f.write(self.to_prometheus())
+
+    def export(self, jsonl_path=METRICS_JSONL, prom_path=METRICS_PROM, **run_labels):
+        """The scripts call this in a finally block, so a run that crashed also shows where it got stuck."""
+        self.write_jsonl(jsonl_path, **run_labels)
+        self.write_prometheus(prom_path)
+        print(f"Metrics written to {jsonl_path} and {prom_path}")
+
+
+# Shared registry of the whole process
+metrics = Metrics()
@@ -0,0 +1,112 @@
+from collections import Counter
+
+# Rough size of a request per resource type, used to estimate the bytes saved by blocking it
+ESTIMATED_BYTES = {
+    "media": 1_000_000,
+    "image": 40_000,
+    "font": 50_000,
+    "script": 80_000,
+    "stylesheet": 30_000,
+    "xhr": 20_000,
+    "fetch": 20_000,
+    "other": 10_000,
+}
+
+# Ad, analytics and tracking endpoints that none of the scrapers need
+TRACKING_PATTERNS = [
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "youtube.com/api/stats/",
+    "youtube.com/ptracking",
+    "youtube.com/pagead/",
+    "youtubei/v1/log_event",
+    "/log/sentry/",
+    "mon.tiktokv.com",
+    "mcs.tiktokw",
+    "analytics.tiktok.com",
+]
+
+# Video streams that are loaded as xhr/fetch instead of as media
+VIDEO_PATTERNS = [
+    "googlevideo.com/videoplayback",
+    "tiktokcdn.com/video/",
+    "tiktokcdn-us.com/video/",
+    "/video/tos/",
+    ".mp4",
+]
+
+# Per path profiles: resource types and URL patterns to block, allow patterns always win
+PROFILES = {
+    # Hashtag feeds only need the anchors of the feed items, not the hover previews of the player
+    "feed": {
+        "block_types": {"media", "image", "font", "texttrack"},
+        "block_patterns": TRACKING_PATTERNS + VIDEO_PATTERNS + ["youtubei/v1/player"],
+        "allow_patterns": [],
+    },
+    # The Shorts label check needs the player and reel data, because they fill the metapanel
+    "label": {
+        "block_types": {"media", "image", "font", "texttrack"},
+        "block_patterns": TRACKING_PATTERNS + VIDEO_PATTERNS,
+        "allow_patterns": ["youtubei/v1/player", "youtubei/v1/next", "youtubei/v1/reel"],
+    },
+    "none": {
+        "block_types": set(),
+        "block_patterns": [],
+        "allow_patterns": [],
+    },
+}
+
+
+class ResourceBlocker:
+    """
+    Blocks requests of a page that are not needed for scraping, using Playwright routing.
+    Keeps counters of the blocked requests and an estimate of the bytes that were not downloaded.
+    """
+    def __init__(self, profile="feed", block_types=None, block_patterns=None, allow_patterns=None):
+        settings = PROFILES[profile]
+        self.profile = profile
+        self.block_types = set(settings["block_types"] if block_types is None else block_types)
+        self.block_patterns = list(settings["block_patterns"] if block_patterns is None else block_patterns)
+        self.allow_patterns = list(settings["allow_patterns"] if allow_patterns is None else allow_patterns)
+        self.blocked = Counter()  # resource type -> number of blocked requests
+        self.allowed = Counter()  # resource type -> number of allowed requests
+        self.bytes_saved = 0
+        self.bytes_loaded = 0
+
+    def should_block(self, url, resource_type):
+        if any(pattern in url for pattern in self.allow_patterns):
+            return False
+        if resource_type in self.block_types:
+            return True
+        return any(pattern in url for pattern in self.block_patterns)
+
+    async def handle_route(self, route):
+        request = route.request
+        if self.should_block(request.url, request.resource_type):
+            self.blocked[request.resource_type] += 1
+            self.bytes_saved += ESTIMATED_BYTES.get(request.resource_type, ESTIMATED_BYTES["other"])
+            await route.abort()
+        else:
+            self.allowed[request.resource_type] += 1
+            await route.continue_()
+
+    def count_response(self, response):
+        content_length = response.headers.get("content-length")
+        if content_length and content_length.isdigit():
+            self.bytes_loaded += int(content_length)
+
+    async def attach(self, page):
+        """Routes all requests of the page through the blocker."""
+        if not self.block_types and not self.block_patterns:
+            return  # Nothing to block, avoid the routing overhead
+        await page.route("**/*", self.handle_route)
+        page.on("response", self.count_response)
+
+    def summary(self):
+        blocked = sum(self.blocked.values())
+        total = blocked + sum(self.allowed.values())
+        return (f"Blocked {blocked}/{total} requests ({dict(self.blocked)}), "
+                f"~{self.bytes_saved / 1_000_000:.1f} MB saved, {self.bytes_loaded / 1_000_000:.1f} MB loaded")
@@ -0,0 +1,144 @@
+import asyncio
+import random
+from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
+from utils.metrics import metrics
+
+# Resolves as soon as the link harvester has new, not yet drained hrefs
+NEW_ITEMS_JS = "() => window.__linkHarvester !== undefined && window.__linkHarvester.pending.length > 0"
+
+
+class PacingController:
+    """
+    Waits after a scroll until the feed delivered new content, instead of sleeping a fixed time.
+    The wait ends when the link harvester has new items or when the network has been quiet for
+    quiet_period seconds, but never before a jittered minimum and never after a jittered maximum.
+    Every pause_every scrolls an extra pause_range pause keeps the scrolling from being too aggressive.
+    """
+    def __init__(self, page, min_wait=0.5, max_wait=4.0, jitter=0.25, quiet_period=0.5, pause_every=10,
+                 pause_range=(3, 5)):
+        self.page = page
+        self.min_wait = min_wait
+        self.max_wait = max_wait
+        self.jitter = jitter
+        self.quiet_period = quiet_period
+        self.pause_every = pause_every
+        self.pause_range = pause_range
+        self.inflight = set()
+        self.last_activity = 0.0
+
+    def attach(self):
+        """Follows the requests of the page, to know when the network is quiet."""
+        self.last_activity = asyncio.get_running_loop().time()
+        self.page.on("request", self.request_started)
+        self.page.on("requestfinished", self.request_done)
+        self.page.on("requestfailed", self.request_done)
+        return self
+
+    def request_started(self, request):
+        self.inflight.add(request)
+        self.last_activity = asyncio.get_running_loop().time()
+
+    def request_done(self, request):
+        self.inflight.discard(request)
+        self.last_activity = asyncio.get_running_loop().time()
+
+    async def wait_for_new_items(self, timeout):
+        try:
+            await self.page.wait_for_function(NEW_ITEMS_JS, timeout=timeout * 1000)
+            return True
+        except PlaywrightTimeoutError:
+            return False
+
+    async def wait_for_quiet(self, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            if not self.inflight and loop.time() - self.last_activity >= self.quiet_period:
+                return True
+            await asyncio.sleep(0.1)
+        return False
+
+    @staticmethod
+    def task_settled(task):
+        """A wait that failed (e.g. the page navigated or closed mid-scroll) counts as not settled."""
+        try:
+            return task.result()
+        except PlaywrightError as e:
+            metrics.inc("pacing_errors_total", error=type(e).__name__)
+            return False
+
+    async def wait(self, scroll_attempts):
+        """Waits for the content of the last scroll, returns True if the feed settled before the maximum wait."""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        minimum = random.uniform(self.min_wait, self.min_wait * (1 + self.jitter))
+        maximum = random.uniform(self.max_wait * (1 - self.jitter), self.max_wait)
+
+        pending = {asyncio.create_task(self.wait_for_new_items(maximum)),
+                   asyncio.create_task(self.wait_for_quiet(maximum))}
+        settled = False
+        while pending and not settled:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            settled = any([self.task_settled(task) for task in done])
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        # Never scroll faster than the jittered minimum
+        remaining = minimum - (loop.time() - start)
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+        metrics.observe("pacing_wait_seconds", loop.time() - start, settled=settled)
+
+        if self.pause_every and scroll_attempts % self.pause_every == 0:
+            print("Pausing briefly to make it not too agressive...")
+            await asyncio.sleep(random.uniform(*self.pause_range))
+        return settled
+
+
+class YieldModel:
+    """
+    Decides when a feed is exhausted from the number of new URLs per scroll.
+    Keeps an exponentially weighted moving average (EWMA) of the yield and its peak. Scrolling stops after
+    patience zero-yield scrolls once the average dropped below stop_ratio of the peak, and always after
+    max_zero_streak zero-yield scrolls. Zero-yield scrolls after which the feed did not settle (a slow network)
+    only count towards max_unsettled, so a slow feed is not given up too early.
+    """
+    def __init__(self, alpha=0.5, stop_ratio=0.15, patience=2, max_zero_streak=5, max_unsettled=6, min_scrolls=3):
+        self.alpha = alpha
+        self.stop_ratio = stop_ratio
+        self.patience = patience
+        self.max_zero_streak = max_zero_streak
+        self.max_unsettled = max_unsettled
+        self.min_scrolls = min_scrolls
+        self.scrolls = 0
+        self.ewma = None
+        self.peak = 0.0
+        self.zero_streak = 0
+        self.unsettled_streak = 0
+
+    def update(self, new_urls, settled=True):
+        self.scrolls += 1
+        if new_urls > 0:
+            self.zero_streak = 0
+            self.unsettled_streak = 0
+        elif settled:
+            self.zero_streak += 1
+        else:
+            self.unsettled_streak += 1
+            return  # Nothing is known about the yield of this scroll yet
+
+        self.ewma = new_urls if self.ewma is None else self.alpha * new_urls + (1 - self.alpha) * self.ewma
+        self.peak = max(self.peak, self.ewma)
+
+    def should_stop(self):
+        if self.zero_streak >= self.max_zero_streak or self.unsettled_streak >= self.max_unsettled:
+            return True
+        if self.scrolls < self.min_scrolls or self.zero_streak < self.patience:
+            return False
+        return self.ewma is not None and self.ewma <= self.stop_ratio * self.peak
+
+    def summary(self):
+        ewma = 0.0 if self.ewma is None else self.ewma
+        return (f"yield {ewma:.1f} URLs/scroll (peak {self.peak:.1f}), {self.zero_streak} empty scrolls, "
+                f"{self.unsettled_streak} unsettled scrolls")
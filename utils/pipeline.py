@@ -0,0 +1,91 @@
+import asyncio
+from utils.metrics import metrics, COUNT_BUCKETS
+
+
+class IncrementalCsvWriter:
+    """Appends DataFrames to a CSV file, the header is only written with the first rows."""
+    def __init__(self, path):
+        self.path = path
+        self.rows_written = 0
+        self.header_written = False
+
+    def write(self, df):
+        if df.empty:
+            return
+        df.to_csv(self.path, mode='a' if self.header_written else 'w', header=not self.header_written, index=False)
+        self.header_written = True
+        self.rows_written += len(df)
+
+    def close(self):
+        # Leave an (empty) file behind when nothing matched, like the non-streaming scripts do
+        if not self.header_written:
+            open(self.path, 'w').close()
+
+
+async def run_pipeline(url_stream, enrich, on_rows, batch_size=50, queue_size=500, max_wait=5.0, num_consumers=1):
+    """
+    Streams URLs from url_stream into a bounded queue while consumers enrich them in batches.
+    enrich is an async function that turns a list of URLs into a DataFrame, on_rows receives every
+    non-empty DataFrame. A batch is enriched when it has batch_size URLs or when no new URL arrived
+    for max_wait seconds, so enrichment keeps up with slow scrolling. Returns the number of rows.
+    """
+    queue = asyncio.Queue(maxsize=queue_size)
+    done = object()  # Marks the end of the stream
+    loop = asyncio.get_running_loop()
+
+    async def produce():
+        try:
+            async for url in url_stream:
+                await queue.put(url)
+                metrics.set("queue_depth", queue.qsize(), queue="pipeline")
+        finally:
+            await queue.put(done)
+
+    async def next_batch():
+        """Returns the next batch of URLs, None when the stream has ended."""
+        first = await queue.get()
+        if first is done:
+            await queue.put(done)  # Let the other consumers stop as well
+            return None
+
+        batch = [first]
+        deadline = loop.time() + max_wait
+        while len(batch) < batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                url = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if url is done:
+                await queue.put(done)
+                break
+            batch.append(url)
+        return batch
+
+    async def consume():
+        rows = 0
+        while (batch := await next_batch()) is not None:
+            metrics.observe("batch_size_urls", len(batch), buckets=COUNT_BUCKETS, stage="enrich")
+            with metrics.timer("enrich_seconds", stage="enrich"):
+                df = await enrich(batch)
+            if len(df):
+                on_rows(df)
+                rows += len(df)
+        return rows
+
+    producer = asyncio.create_task(produce())
+    consumers = [asyncio.create_task(consume()) for _ in range(num_consumers)]
+    try:
+        rows = sum(await asyncio.gather(*consumers))
+    except BaseException:
+        producer.cancel()
+        for consumer in consumers:
+            consumer.cancel()
+        await asyncio.gather(producer, *consumers, return_exceptions=True)
+        raise
+    await producer  # Raises the error of the scraper, if it crashed
+
+    print(f"Pipeline finished, {rows} rows written.")
+    return rows
@@ -0,0 +1,81 @@
+import datetime
+import json
+import os
+from zoneinfo import ZoneInfo
+from utils.atomic import atomic_write_json
+
+QUOTA_LEDGER = 'data/youtube_quota.json'
+
+# The YouTube Data API quota resets at midnight Pacific Time, which follows daylight saving time
+PACIFIC = ZoneInfo("America/Los_Angeles")
+
+
+class QuotaExceededError(Exception):
+    """Raised when the daily quota of the API key is used up, pending_ids are the video IDs that were not fetched."""
+    def __init__(self, message, pending_ids=()):
+        super().__init__(message)
+        self.pending_ids = list(pending_ids)
+
+
+class QuotaLedger:
+    """
+    Keeps the quota units used today in a JSON file, so separate runs on the same API key add up.
+    Once the API reports quotaExceeded the ledger stays exhausted until the quota resets,
+    and the video IDs that could not be fetched are kept as pending for the next run.
+    """
+    def __init__(self, path=QUOTA_LEDGER, daily_limit=10000):
+        self.path = path
+        self.daily_limit = daily_limit
+        self.state = self.load()
+
+    def today(self):
+        return datetime.datetime.now(PACIFIC).strftime('%Y-%m-%d')
+
+    def load(self):
+        state = {"day": self.today(), "units": 0, "exhausted": False, "pending_ids": []}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                saved = json.load(f)
+            # A new day starts with a fresh quota, but the pending IDs are kept
+            state["pending_ids"] = saved.get("pending_ids", [])
+            if saved.get("day") == state["day"]:
+                state.update(units=saved.get("units", 0), exhausted=saved.get("exhausted", False))
+        return state
+
+    def save(self):
+        atomic_write_json(self.path, self.state, indent=4)
+
+    def refresh(self):
+        if self.state["day"] != self.today():
+            self.state.update(day=self.today(), units=0, exhausted=False)
+
+    def add(self, units):
+        self.refresh()
+        self.state["units"] += units
+        self.save()
+
+    def remaining(self):
+        self.refresh()
+        return 0 if self.state["exhausted"] else max(self.daily_limit - self.state["units"], 0)
+
+    def exhausted(self):
+        self.refresh()
+        return self.state["exhausted"]
+
+    def mark_exhausted(self, pending_ids=()):
+        self.refresh()
+        self.state["exhausted"] = True
+        self.add_pending(pending_ids)
+
+    def add_pending(self, video_ids):
+        self.state["pending_ids"] = list(dict.fromkeys([*self.state["pending_ids"], *video_ids]))
+        self.save()
+
+    def remove_pending(self, video_ids):
+        video_ids = set(video_ids)
+        if video_ids.intersection(self.state["pending_ids"]):
+            self.state["pending_ids"] = [video_id for video_id in self.state["pending_ids"] if video_id not in video_ids]
+            self.save()
+
+    def pending_ids(self):
+        return list(self.state["pending_ids"])
@@ -0,0 +1,55 @@
+import random
+
+# Smoothly scrolls to the target position inside the page and resolves when it is reached.
+# Every step moves speed +/- speed pixels and waits 20-100 ms plus one animation frame,
+# the same speed profile as the old per-step page.evaluate loop, but in a single round trip.
+SMOOTH_SCROLL_JS = """
+async ([target, speed]) => {
+    const scroller = document.scrollingElement || document.documentElement;
+    let position = scroller.scrollTop || document.body.scrollTop;
+    const down = target >= position;
+    while (down ? position < target : position > target) {
+        await new Promise(resolve => setTimeout(resolve, 20 + Math.random() * 80));
+        await new Promise(resolve => requestAnimationFrame(resolve));
+        const step = speed + Math.floor(Math.random() * (2 * speed + 1)) - speed;
+        position += down ? step : -step;
+        window.scrollTo(0, position);
+    }
+    return position;
+}
+"""
+
+PAGE_POSITION_JS = """
+() => [
+    document.documentElement.scrollTop || document.body.scrollTop,
+    document.documentElement.scrollHeight || document.body.scrollHeight
+]
+"""
+
+
+async def smooth_scroll(page, min_fraction, max_fraction, speed=10):
+    """Scrolls down between min_fraction and max_fraction of the total page height, returns the new position."""
+    current_scroll_position, total_height = await page.evaluate(PAGE_POSITION_JS)
+
+    scroll_distance = random.randint(int(total_height * min_fraction), int(total_height * max_fraction))
+    target_position = current_scroll_position + scroll_distance
+
+    print(f"Scrolling from {current_scroll_position} to {target_position} / {total_height}")
+    return await page.evaluate(SMOOTH_SCROLL_JS, [target_position, speed])
+
+
+async def smooth_scroll_up(page, distance=300, speed=10):
+    """Smoothly scrolls up by distance pixels to refresh content."""
+    current_scroll_position, _ = await page.evaluate(PAGE_POSITION_JS)
+
+    print(f"Smooth scrolling up by {-distance} pixels")
+    return await page.evaluate(SMOOTH_SCROLL_JS, [max(current_scroll_position - distance, 0), speed])
+
+
+async def scroll_feed(page, pacer, scroll_attempts, min_fraction, max_fraction, speed=10):
+    """
+    Scrolls a feed and lets the PacingController wait until the platform loaded the new content.
+    Returns True if the feed settled, False if the wait ran into its maximum.
+    """
+    await smooth_scroll(page, min_fraction, max_fraction, speed)
+    return await pacer.wait(scroll_attempts)
@@ -0,0 +1,53 @@
+import asyncio
+import os
+from utils.atomic import atomic_write_json
+
+STATE_FOLDER = 'data/session_state'
+
+# Only the consent cookies are kept for YouTube, so a reused state still behaves like an incognito session
+YOUTUBE_CONSENT_COOKIES = ("SOCS", "CONSENT")
+
+
+def state_path(platform, country, folder=STATE_FOLDER):
+    """Path of the saved storage_state of a platform, per country because the consent/captcha state is per location."""
+    return os.path.join(folder, f"{platform}_{country}.json")
+
+
+def load_state(path):
+    """Returns the path if a saved storage_state exists, None for a cold (incognito) start."""
+    return path if path and os.path.exists(path) else None
+
+
+async def save_state(context, path, keep_cookies=None):
+    """
+    Saves the storage_state of the context, so the next run skips the consent banner or captcha.
+    With keep_cookies only the cookies with these names are kept and the local storage is dropped.
+    """
+    state = await context.storage_state()
+    if keep_cookies is not None:
+        state = {"cookies": [cookie for cookie in state["cookies"] if cookie["name"] in keep_cookies], "origins": []}
+    atomic_write_json(path, state)
+
+
+async def race_selectors(page, selectors, timeout=15):
+    """
+    Waits until one of the selectors (a dict name -> selector) is visible and returns its name,
+    None when none of them appeared within timeout seconds.
+    """
+    async def wait(name, selector):
+        await page.wait_for_selector(selector, state="visible", timeout=timeout * 1000)
+        return name
+
+    tasks = [asyncio.create_task(wait(name, selector)) for name, selector in selectors.items()]
+    winner = None
+    pending = set(tasks)
+    while pending and winner is None:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if not task.exception():
+                winner = task.result()
+                break
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    return winner
@@ -0,0 +1,173 @@
+import json
+import sqlite3
+import time
+import pandas as pd
+
+SNAPSHOT_PATH = 'data/engagement_snapshots.sqlite'
+COUNTERS = ("views", "likes", "comments", "shares")
+
+
+class SnapshotStore:
+    """
+    Time series of the engagement counters per video, for re-polling known videos.
+    A snapshot is only stored when one of the counters changed since the previous poll,
+    the latest table keeps the last counters and when a video was last checked.
+    """
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """CREATE TABLE IF NOT EXISTS snapshots (
+                platform TEXT NOT NULL,
+                video_id TEXT NOT NULL,
+                polled_at REAL NOT NULL,
+                views INTEGER,
+                likes INTEGER,
+                comments INTEGER,
+                shares INTEGER,
+                PRIMARY KEY (platform, video_id, polled_at)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS latest (
+                platform TEXT NOT NULL,
+                video_id TEXT NOT NULL,
+                views INTEGER,
+                likes INTEGER,
+                comments INTEGER,
+                shares INTEGER,
+                checked_at REAL NOT NULL,
+                PRIMARY KEY (platform, video_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_latest_checked_at ON latest (platform, checked_at);""")
+        self.conn.commit()
+
+    def latest(self, platform, video_ids):
+        """Returns a dict video_id -> tuple of the last stored counters."""
+        video_ids = list(video_ids)
+        latest = {}
+        # SQLite limits the number of parameters per query, so look the IDs up in chunks
+        for i in range(0, len(video_ids), 500):
+            chunk = video_ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT video_id, views, likes, comments, shares FROM latest "
+                f"WHERE platform = ? AND video_id IN ({placeholders})", [platform, *chunk]).fetchall()
+            for video_id, *counters in rows:
+                latest[video_id] = tuple(counters)
+        return latest
+
+    def record_many(self, platform, stats, polled_at=None):
+        """
+        Stores a dict video_id -> {views, likes, comments, shares}, only the videos of which a counter changed
+        get a new snapshot. Returns the number of new snapshots.
+        """
+        polled_at = polled_at or time.time()
+        previous = self.latest(platform, stats)
+        snapshots = []
+        for video_id, record in stats.items():
+            counters = tuple(to_int(record.get(counter)) for counter in COUNTERS)
+            if previous.get(video_id) != counters:
+                snapshots.append((platform, video_id, polled_at, *counters))
+
+        self.conn.executemany("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?)", snapshots)
+        self.conn.executemany(
+            """INSERT INTO latest VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (platform, video_id) DO UPDATE SET
+                   views = excluded.views, likes = excluded.likes, comments = excluded.comments,
+                   shares = excluded.shares, checked_at = excluded.checked_at""",
+            [(platform, video_id, *counters, polled_at) for platform, video_id, _, *counters in snapshots])
+        changed = {video_id for _, video_id, *_ in snapshots}
+        unchanged = [(polled_at, platform, video_id) for video_id in stats if video_id not in changed]
+        self.conn.executemany("UPDATE latest SET checked_at = ? WHERE platform = ? AND video_id = ?", unchanged)
+        self.conn.commit()
+        return len(snapshots)
+
+    def due(self, platform, video_ids, min_age=20 * 3600):
+        """Returns the video IDs that were never polled or not in the last min_age seconds."""
+        video_ids = list(dict.fromkeys(video_ids))
+        threshold = time.time() - min_age
+        recent = set()
+        for i in range(0, len(video_ids), 500):
+            chunk = video_ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT video_id FROM latest WHERE platform = ? AND checked_at >= ? AND video_id IN ({placeholders})",
+                [platform, threshold, *chunk]).fetchall()
+            recent.update(video_id for (video_id,) in rows)
+        return [video_id for video_id in video_ids if video_id not in recent]
+
+    def growth_curves(self, platform, video_ids=None):
+        """
+        Returns the snapshots of the platform (optionally only of video_ids) as a DataFrame with the
+        counters, the gains since the previous snapshot and the hours since the first snapshot.
+        """
+        query = "SELECT * FROM snapshots WHERE platform = ?"
+        params = [platform]
+        if video_ids is not None:
+            video_ids = list(video_ids)
+            frames = []
+            for i in range(0, len(video_ids), 500):
+                chunk = video_ids[i:i + 500]
+                frames.append(pd.read_sql_query(
+                    f"{query} AND video_id IN ({','.join('?' * len(chunk))})", self.conn, params=[*params, *chunk]))
+            df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        else:
+            df = pd.read_sql_query(query, self.conn, params=params)
+        if df.empty:
+            return df
+
+        df = df.sort_values(["video_id", "polled_at"], ignore_index=True)
+        df["polled_at"] = pd.to_datetime(df["polled_at"], unit="s", utc=True)
+        grouped = df.groupby("video_id")
+        for counter in COUNTERS:
+            df[f"{counter}_gain"] = grouped[counter].diff()
+        df["hours_since_first"] = (df["polled_at"] - grouped["polled_at"].transform("min")).dt.total_seconds() / 3600
+        return df
+
+    def close(self):
+        self.conn.close()
+
+
+class EtagStore:
+    """
+    ETag and response of the last YouTube Data API call per batch, kept next to the snapshots, so the re-polls
+    of a next run are answered with 304 Not Modified too. Used by YouTubeDataClient as a dict with get and [] =,
+    the key is (part, fields, video IDs), so a batch only matches when it has the same IDs in the same order.
+    """
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS etags (
+                batch TEXT PRIMARY KEY,
+                etag TEXT NOT NULL,
+                data_json TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            ) WITHOUT ROWID""")
+        self.conn.commit()
+
+    def batch_key(self, key):
+        part, fields, video_ids = key
+        return f"{part}|{fields}|{','.join(video_ids)}"
+
+    def get(self, key):
+        row = self.conn.execute("SELECT etag, data_json FROM etags WHERE batch = ?", [self.batch_key(key)]).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def __setitem__(self, key, value):
+        etag, data = value
+        self.conn.execute("INSERT OR REPLACE INTO etags VALUES (?, ?, ?, ?)",
+                          [self.batch_key(key), etag, json.dumps(data), time.time()])
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def to_int(value):
+    """Counters come as strings from the YouTube API and may be missing (e.g. hidden likes)."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
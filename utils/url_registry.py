@@ -0,0 +1,134 @@
+import datetime
+import json
+import os
+import re
+import sqlite3
+
+REGISTRY_PATH = 'data/url_registry.sqlite'
+
+VIDEO_ID_PATTERNS = {
+    'youtube': re.compile(r"/shorts/([\w-]+)"),
+    'tiktok': re.compile(r"/video/(\d+)"),
+}
+
+
+def canonical_id(url):
+    """Returns (platform, video_id) of a YouTube Shorts or TikTok video URL, None for other URLs."""
+    for platform, pattern in VIDEO_ID_PATTERNS.items():
+        match = pattern.search(url)
+        if match:
+            return platform, match.group(1)
+    return None
+
+
+def new_run_id():
+    return datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+class UrlRegistry:
+    """
+    Persistent registry of every scraped video, keyed by platform and video ID.
+    Keeps the run in which a video was first seen, the hashtags and countries it was found for,
+    and whether it has been enriched and label checked, so pending work is a single indexed query.
+    """
+    def __init__(self, path=REGISTRY_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript(
+            """CREATE TABLE IF NOT EXISTS urls (
+                platform TEXT NOT NULL,
+                video_id TEXT NOT NULL,
+                url TEXT NOT NULL,
+                first_seen_run TEXT NOT NULL,
+                enriched_at TEXT,
+                label_status TEXT,
+                PRIMARY KEY (platform, video_id)
+            );
+            CREATE TABLE IF NOT EXISTS sightings (
+                platform TEXT NOT NULL,
+                video_id TEXT NOT NULL,
+                hashtag TEXT NOT NULL,
+                country TEXT NOT NULL,
+                run_id TEXT NOT NULL,
+                PRIMARY KEY (platform, video_id, hashtag, country)
+            );
+            CREATE INDEX IF NOT EXISTS idx_urls_pending_enrichment ON urls (platform, enriched_at);
+            CREATE INDEX IF NOT EXISTS idx_urls_pending_labels ON urls (platform, label_status);""")
+        self.conn.commit()
+
+    def canonical_rows(self, urls):
+        rows = []
+        for url in urls:
+            key = canonical_id(url)
+            if key is not None:
+                rows.append((*key, url))
+        return rows
+
+    def register(self, urls, hashtag, country, run_id=None):
+        """Registers scraped URLs, a video that was seen before keeps its first run."""
+        run_id = run_id or new_run_id()
+        rows = self.canonical_rows(urls)
+        self.conn.executemany(
+            """INSERT INTO urls (platform, video_id, url, first_seen_run) VALUES (?, ?, ?, ?)
+               ON CONFLICT (platform, video_id) DO UPDATE SET
+                   first_seen_run = MIN(urls.first_seen_run, excluded.first_seen_run)""",
+            [(platform, video_id, url, run_id) for platform, video_id, url in rows])
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO sightings VALUES (?, ?, ?, ?, ?)",
+            [(platform, video_id, hashtag, country, run_id) for platform, video_id, _ in rows])
+        self.conn.commit()
+        return len(rows)
+
+    def mark_enriched(self, urls):
+        """Marks URLs that ended up in a dataset, URLs that did not match a hashtag stay pending for the final check."""
+        enriched_at = new_run_id()
+        self.conn.executemany(
+            "UPDATE urls SET enriched_at = ? WHERE platform = ? AND video_id = ?",
+            [(enriched_at, platform, video_id) for platform, video_id, _ in self.canonical_rows(urls)])
+        self.conn.commit()
+
+    def mark_labeled(self, urls, status='ok'):
+        self.conn.executemany(
+            "UPDATE urls SET label_status = ? WHERE platform = ? AND video_id = ?",
+            [(status, platform, video_id) for platform, video_id, _ in self.canonical_rows(urls)])
+        self.conn.commit()
+
+    def pending_enrichment(self, platform):
+        """Returns the URLs of the platform that have not been enriched yet."""
+        rows = self.conn.execute(
+            "SELECT url FROM urls WHERE platform = ? AND enriched_at IS NULL", (platform,)).fetchall()
+        return [url for (url,) in rows]
+
+    def pending_labels(self, platform='youtube'):
+        """Returns the enriched URLs of the platform that have not been label checked yet."""
+        rows = self.conn.execute(
+            "SELECT url FROM urls WHERE platform = ? AND enriched_at IS NOT NULL AND label_status IS NULL",
+            (platform,)).fetchall()
+        return [url for (url,) in rows]
+
+    def sightings(self, url):
+        """Returns the (hashtag, country) combinations a video was found for."""
+        key = canonical_id(url)
+        if key is None:
+            return []
+        return self.conn.execute(
+            "SELECT hashtag, country FROM sightings WHERE platform = ? AND video_id = ?", key).fetchall()
+
+    def import_json_outputs(self, hashtags, countries, data_dir='data', platforms=('youtube', 'tiktok')):
+        """Registers the URL lists of earlier runs, data/{platform}/{hashtag}/{hashtag}_{country}.json, skipping missing files."""
+        missing = 0
+        for platform in platforms:
+            for hashtag in hashtags:
+                for country in countries:
+                    path = os.path.join(data_dir, platform, hashtag, f'{hashtag}_{country}.json')
+                    if not os.path.exists(path):
+                        missing += 1
+                        continue
+                    with open(path, 'r') as f:
+                        run_id = datetime.datetime.fromtimestamp(os.path.getmtime(path)).strftime('%Y-%m-%d %H:%M:%S')
+                        self.register(json.load(f), hashtag, country, run_id)
+        if missing:
+            print(f"Skipped {missing} hashtag/country combinations without a URL file.")
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,112 @@
+import sqlite3
+import json
+import time
+import pandas as pd
+
+CACHE_PATH = 'data/video_cache.sqlite'
+
+# Fields that never change once a video is published, these are kept forever
+IMMUTABLE_FIELDS = ("url", "publishedAt", "hashtags", "ai_label")
+
+
+class VideoCache:
+    """
+    On-disk cache of video metadata shared by the TikTok and YouTube APIs, keyed by platform and video ID.
+    The immutable fields never expire, the engagement counters expire after stats_ttl seconds.
+    When the cache holds more than max_entries videos, the least recently used ones are removed.
+    """
+    def __init__(self, path=CACHE_PATH, stats_ttl=7 * 24 * 3600, max_entries=500000):
+        self.path = path
+        self.stats_ttl = stats_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS videos (
+                platform TEXT NOT NULL,
+                video_id TEXT NOT NULL,
+                static_json TEXT NOT NULL,
+                stats_json TEXT NOT NULL,
+                stats_fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (platform, video_id)
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_videos_last_access ON videos (last_access)")
+        self.conn.commit()
+
+    def get_many(self, platform, video_ids, allow_stale=False):
+        """
+        Returns a dict video_id -> cached record for the requested videos.
+        Videos with expired counters are left out unless allow_stale is True.
+        """
+        records, stale = self.lookup(platform, video_ids)
+        return {**records, **stale} if allow_stale else records
+
+    def lookup(self, platform, video_ids):
+        """
+        Returns two dicts video_id -> cached record: the videos with fresh counters and the videos whose counters
+        expired. Of the latter only the counters have to be fetched again, their other fields never change.
+        """
+        video_ids = list(dict.fromkeys(video_ids))
+        now = time.time()
+        records = {}
+        stale = {}
+
+        # SQLite limits the number of parameters per query, so look the IDs up in chunks
+        for i in range(0, len(video_ids), 500):
+            chunk = video_ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT video_id, static_json, stats_json, stats_fetched_at FROM videos "
+                f"WHERE platform = ? AND video_id IN ({placeholders})", [platform, *chunk]).fetchall()
+            for video_id, static_json, stats_json, stats_fetched_at in rows:
+                found = stale if now - stats_fetched_at > self.stats_ttl else records
+                found[video_id] = {**json.loads(static_json), **json.loads(stats_json)}
+
+        # Mark the hits as recently used for the LRU eviction
+        self.conn.executemany(
+            "UPDATE videos SET last_access = ? WHERE platform = ? AND video_id = ?",
+            [(now, platform, video_id) for video_id in [*records, *stale]])
+        self.conn.commit()
+
+        self.hits += len(records)
+        self.misses += len(video_ids) - len(records)
+        return records, stale
+
+    def frame(self, platform, video_ids):
+        """Returns the cached records of the videos as a DataFrame indexed by video ID, also the ones with expired counters."""
+        records = self.get_many(platform, video_ids, allow_stale=True)
+        return pd.DataFrame.from_dict(records, orient='index')
+
+    def put_many(self, platform, records):
+        """Stores a dict video_id -> record, splitting it in immutable fields and engagement counters."""
+        now = time.time()
+        rows = []
+        for video_id, record in records.items():
+            static = {key: value for key, value in record.items() if key in IMMUTABLE_FIELDS}
+            stats = {key: value for key, value in record.items() if key not in IMMUTABLE_FIELDS}
+            rows.append((platform, video_id, json.dumps(static), json.dumps(stats), now, now))
+
+        self.conn.executemany(
+            """INSERT INTO videos (platform, video_id, static_json, stats_json, stats_fetched_at, last_access)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT (platform, video_id) DO UPDATE SET
+                   static_json = excluded.static_json,
+                   stats_json = excluded.stats_json,
+                   stats_fetched_at = excluded.stats_fetched_at,
+                   last_access = excluded.last_access""", rows)
+        self.evict()
+        self.conn.commit()
+
+    def evict(self):
+        """Removes the least recently used videos when the cache is larger than max_entries."""
+        count = self.conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+        if count > self.max_entries:
+            self.conn.execute(
+                "DELETE FROM videos WHERE rowid IN (SELECT rowid FROM videos ORDER BY last_access ASC LIMIT ?)",
+                (count - self.max_entries,))
+
+    def close(self):
+        self.conn.close()